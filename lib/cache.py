@@ -0,0 +1,116 @@
+import hashlib
+from lib import loader
+import logging
+import marshal
+import os
+from pathlib import Path
+import sys
+import tempfile
+
+CHUNK_SIZE = 1000
+SUFFIX = ".bin"
+
+
+def _read_entries(path):
+    with open(path, "rb") as cache_file:
+        try:
+            while True:
+                yield from marshal.load(cache_file)
+        except EOFError:
+            pass
+
+
+# On-disk cache of decoded input files. Each file is stored as a sequence
+# of marshal dumps of CHUNK_SIZE entries, under a name derived from its
+# absolute path, size and mtime, so any change to the file is a miss.
+# Entries are evicted least recently used first once the cache grows over
+# max_size MB.
+class FileCache:
+    def __init__(self, cache_dir, max_size=1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size * 1024 * 1024
+        self.size = None
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, file):
+        stat = loader.stat_file(file)
+        ident = (f"{os.path.abspath(file)}\0{stat.st_size}\0"
+                 f"{stat.st_mtime_ns}\0{marshal.version}\0"
+                 f"{sys.version_info[0]}.{sys.version_info[1]}")
+        return hashlib.sha1(ident.encode()).hexdigest()
+
+    def list_entries(self):
+        return [p for p in self.cache_dir.iterdir() if p.suffix == SUFFIX]
+
+    def info(self):
+        files = self.list_entries()
+        return {
+            "dir": str(self.cache_dir),
+            "entries": len(files),
+            "size_mb": sum(p.stat().st_size for p in files) / 1024 / 1024,
+            "max_size_mb": self.max_size / 1024 / 1024,
+        }
+
+    def clear(self):
+        for path in self.list_entries():
+            path.unlink(missing_ok=True)
+        self.size = 0
+
+    def evict(self):
+        files = list()
+        for path in self.list_entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, path))
+        self.size = sum(val[1] for val in files)
+        for _, size, path in sorted(files, key=lambda x: x[0]):
+            if (self.size <= self.max_size):
+                break
+            logging.info(f"Evicting cache entry {path.name}")
+            path.unlink(missing_ok=True)
+            self.size -= size
+
+    def entries(self, file, decode):
+        path = self.cache_dir / (self.key(file) + SUFFIX)
+        try:
+            # Bump the mtime so eviction sees this entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            logging.info(f"Cache miss for {file}")
+            yield from self._store(path, decode(file))
+            return
+        logging.info(f"Cache hit for {file}")
+        yield from _read_entries(path)
+
+    def _store(self, path, entries):
+        # Write while the entries are handed out, and only move the file
+        # into place once the input has been read completely
+        tmp = tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".tmp", delete=False)
+        done = False
+        try:
+            chunk = list()
+            for entry in entries:
+                chunk.append(entry)
+                yield entry
+                if (len(chunk) >= CHUNK_SIZE):
+                    marshal.dump(chunk, tmp)
+                    chunk = list()
+            if (len(chunk) > 0):
+                marshal.dump(chunk, tmp)
+            tmp.close()
+            os.replace(tmp.name, path)
+            done = True
+        finally:
+            if (not done):
+                tmp.close()
+                os.unlink(tmp.name)
+
+        if (self.size is None):
+            self.evict()
+        else:
+            self.size += path.stat().st_size
+            if (self.size > self.max_size):
+                self.evict()
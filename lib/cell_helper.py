@@ -1,5 +1,7 @@
+import bisect
 import functools
 import logging
+import numpy as np
 
 REGION = {
     "GLOBAL": 255,
@@ -160,31 +162,73 @@ nr_freq_table = [
 ]
 
 
+# EARFCN ranges in cell_table don't overlap, so sorting them by start lets
+# a single bisect find the only range that may hold an EARFCN
+_earfcn_table = sorted(cell_table, key=lambda x: x[1])
+_earfcn_starts = [cell[1] for cell in _earfcn_table]
+_earfcn_ends = [cell[2] for cell in _earfcn_table]
+_earfcn_start_arr = np.array(_earfcn_starts)
+_earfcn_end_arr = np.array(_earfcn_ends)
+_earfcn_band_arr = np.array([cell[0] for cell in _earfcn_table])
+_earfcn_freq_arr = np.array([cell[3] for cell in _earfcn_table])
+
+
+def _earfcn_lookup(earfcn):
+    i = bisect.bisect_right(_earfcn_starts, earfcn) - 1
+    if (i >= 0 and earfcn <= _earfcn_ends[i]):
+        return _earfcn_table[i]
+    return None
+
+
 def earfcn_to_band(earfcn):
-    logging.info(f"converting earfcn {earfcn} to band")
+    logging.info("converting earfcn %s to band", earfcn)
     if earfcn == "NaN":
         return "N/A"
-    for cell in cell_table:
-        if cell[1] <= earfcn and cell[2] >= earfcn:
-            return cell[0]
+    cell = _earfcn_lookup(earfcn)
+    if cell:
+        return cell[0]
     return 0
 
 
 def earfcn_to_freq(earfcn):
-    logging.info(f"converting earfcn {earfcn} to freq")
+    logging.info("converting earfcn %s to freq", earfcn)
     if earfcn == "NaN":
         return "N/A"
-    for cell in cell_table:
-        if cell[1] <= earfcn and cell[2] >= earfcn:
-            return (cell[3] + 0.1 * (earfcn - cell[1]))
+    cell = _earfcn_lookup(earfcn)
+    if cell:
+        return (cell[3] + 0.1 * (earfcn - cell[1]))
     return 0.0
 
 
-def nrarfcn_to_band(nrarfcn, reg=REGION["GLOBAL"], multiple=False):
-    logging.info(f"converting nrarfcn {nrarfcn} to band, reg {reg}, "
-                 f"multiple {multiple}")
-    if nrarfcn == "NaN":
-        return "N/A"
+def earfcn_to_band_freq_array(earfcns):
+    # Array version of earfcn_to_band and earfcn_to_freq, returns the bands
+    # and frequencies of all EARFCNs at once. "NaN" entries map to "N/A",
+    # in which case the results are object arrays.
+    earfcns = np.asarray(earfcns, dtype=object)
+    is_nan = np.array([val == "NaN" for val in earfcns.flat],
+                      dtype=bool).reshape(earfcns.shape)
+    values = np.where(is_nan, -1, earfcns).astype(np.int64)
+
+    idx = np.searchsorted(_earfcn_start_arr, values, side="right") - 1
+    idx_safe = np.maximum(idx, 0)
+    found = (idx >= 0) & (values <= _earfcn_end_arr[idx_safe])
+    bands = np.where(found, _earfcn_band_arr[idx_safe], 0)
+    freqs = np.where(
+        found,
+        _earfcn_freq_arr[idx_safe]
+        + 0.1 * (values - _earfcn_start_arr[idx_safe]),
+        0.0)
+    if (is_nan.any()):
+        bands = bands.astype(object)
+        freqs = freqs.astype(object)
+        bands[is_nan] = "N/A"
+        freqs[is_nan] = "N/A"
+    return bands, freqs
+
+
+def _resolve_nr_band(nrarfcn, reg, multiple):
+    # Scan of nr_table picking the narrowest matching band, only used to
+    # build the lookup tables below
     ret = list()
     for cell in nr_table:
         if (cell[1] <= nrarfcn and cell[2] >= nrarfcn
@@ -196,7 +240,7 @@ def nrarfcn_to_band(nrarfcn, reg=REGION["GLOBAL"], multiple=False):
                 "len": cell[2] - cell[1]})
 
     if multiple:
-        return ("N/A" if len(ret == 0)
+        return ("N/A" if len(ret) == 0
                 else ",".join([f"n{val['num']}" for val in ret]))
     else:
         while len(ret) > 1:
@@ -208,11 +252,60 @@ def nrarfcn_to_band(nrarfcn, reg=REGION["GLOBAL"], multiple=False):
                 ret = [smallest]
             else:
                 ret = [val for val in ret if val["num"] != smallest["num"]]
-        return f"n{ret[0]['num']}"
+        return "N/A" if len(ret) == 0 else f"n{ret[0]['num']}"
+
+
+# Every start and end of the NR-ARFCN ranges. The matching bands are the
+# same over each open interval between two consecutive points, so the
+# answer only has to be computed once for each point and each interval.
+_nr_points = sorted({cell[1] for cell in nr_table}
+                    | {cell[2] for cell in nr_table})
+_nr_point_arr = np.array(_nr_points, dtype=np.float64)
+
+
+@functools.lru_cache(maxsize=None)
+def _nr_band_table(reg, multiple):
+    # Slot 2*i is the open interval before _nr_points[i], slot 2*i+1 is the
+    # point itself, and the last slot is everything after the last point
+    bounds = [_nr_points[0] - 1] + _nr_points + [_nr_points[-1] + 1]
+    table = list()
+    for i, point in enumerate(_nr_points):
+        table.append(_resolve_nr_band(
+            (bounds[i] + point) / 2, reg, multiple))
+        table.append(_resolve_nr_band(point, reg, multiple))
+    table.append(_resolve_nr_band(bounds[-1], reg, multiple))
+    return table, np.array(table, dtype=object)
+
+
+def nrarfcn_to_band(nrarfcn, reg=REGION["GLOBAL"], multiple=False):
+    logging.info("converting nrarfcn %s to band, reg %s, multiple %s",
+                 nrarfcn, reg, multiple)
+    if nrarfcn == "NaN":
+        return "N/A"
+    i = bisect.bisect_left(_nr_points, nrarfcn)
+    slot = 2 * i
+    if (i < len(_nr_points) and _nr_points[i] == nrarfcn):
+        slot += 1
+    return _nr_band_table(reg, multiple)[0][slot]
+
+
+def nrarfcn_to_band_array(nrarfcns, reg=REGION["GLOBAL"], multiple=False):
+    # Array version of nrarfcn_to_band, "NaN" entries map to "N/A"
+    nrarfcns = np.asarray(nrarfcns, dtype=object)
+    is_nan = np.array([val == "NaN" for val in nrarfcns.flat],
+                      dtype=bool).reshape(nrarfcns.shape)
+    values = np.where(is_nan, -1, nrarfcns).astype(np.float64)
+
+    idx = np.searchsorted(_nr_point_arr, values, side="left")
+    at_point = (idx < len(_nr_points)) & (
+        _nr_point_arr[np.minimum(idx, len(_nr_points) - 1)] == values)
+    bands = _nr_band_table(reg, multiple)[1][2 * idx + at_point]
+    bands[is_nan] = "N/A"
+    return bands
 
 
 def nrarfcn_to_freq(nrarfcn):
-    logging.info(f"converting nrarfcn {nrarfcn} to freq")
+    logging.info("converting nrarfcn %s to freq", nrarfcn)
     if nrarfcn == "NaN":
         return "NaN"
     for cell in nr_freq_table:
@@ -0,0 +1,170 @@
+from lib import cell_helper
+from lib import filter_json
+from lib import profiler
+from lib import util
+import logging
+
+# Output columns, each row is the overview of its entry followed by one cell
+OVERVIEW_COLUMNS = [
+    "sigcap_version",
+    "android_version",
+    "is_debug",
+    "uuid",
+    "device_name",
+    "timestamp",
+    "latitude",
+    "longitude",
+    "altitude",
+    "hor_acc",
+    "ver_acc",
+    "operator",
+    "network_type*",
+    "override_network_type",
+    "radio_type",
+    "nrStatus",
+    "nrAvailable",
+    "dcNrRestricted",
+    "enDcAvailable",
+    "nrFrequencyRange",
+    "cellBandwidths",
+    "usingCA",
+]
+CELL_COLUMNS = [
+    "lte/nr",
+    "pci",
+    "lte-ci/nr-nci",
+    "lte-earfcn/nr-arfcn",
+    "band*",
+    "freq_mhz*",
+    "width_mhz",
+    "rsrp_dbm",
+    "rsrq_db",
+    "lte-rssi/nr-sinr_dbm",
+    "primary/other*",
+]
+COLUMNS = OVERVIEW_COLUMNS + CELL_COLUMNS
+TIMESTAMP = COLUMNS.index("timestamp")
+# Options that change the output rows, with their defaults
+OPTIONS = {"filter": None, "region": "NAR", "include_invalid_op": False}
+# Cell part of the row written for entries without any cell
+EMPTY_CELL = ("lte", "NaN", "NaN", "NaN", "NaN", "NaN", "NaN", "NaN", "NaN",
+              "NaN", "other")
+# Entries filtered at a time
+BATCH_SIZE = 5000
+
+
+def _iter_rows(sigcap, options):
+    for entry in sigcap:
+        if (
+            not options.include_invalid_op
+            and "opName" not in entry
+            and "simName" not in entry
+            and "carrierName" not in entry
+        ):
+            continue
+
+        operator = util.get_operator_name(entry)
+        if (not options.include_invalid_op and operator == "Unknown"):
+            continue
+        overview = (
+            entry["version"],
+            entry["androidVersion"],
+            entry["isDebug"],
+            entry["uuid"],
+            entry["deviceName"],
+            entry["datetimeIso"],
+            entry["location"]["latitude"],
+            entry["location"]["longitude"],
+            entry["location"]["altitude"],
+            entry["location"]["hor_acc"],
+            entry["location"]["ver_acc"],
+            operator,
+            util.get_network_type(entry),
+            entry["overrideNetworkType"],
+            entry["phoneType"],
+            entry["nrStatus"],
+            entry["nrAvailable"],
+            entry["dcNrRestricted"],
+            entry["enDcAvailable"],
+            entry["nrFrequencyRange"],
+            entry["cellBandwidths"],
+            entry["usingCA"],
+        )
+
+        # Flag to insert a nan rows if there is no cellular data
+        has_data = False
+
+        # LTE primary
+        lte_primary = next(
+            (x for x in entry["cell_info"] if util.is_primary(x)), None)
+        if lte_primary:
+            earfcn = util.clean_signal(lte_primary["earfcn"])
+            yield overview + (
+                "lte",
+                util.clean_signal(lte_primary["pci"]),
+                util.clean_signal(lte_primary["ci"]),
+                earfcn,
+                cell_helper.earfcn_to_band(earfcn),
+                cell_helper.earfcn_to_freq(earfcn),
+                util.clean_signal(lte_primary["width"]),
+                util.clean_signal(lte_primary["rsrp"]),
+                util.clean_signal(lte_primary["rsrq"]),
+                util.clean_signal(lte_primary["rssi"]),
+                "primary",
+            )
+            has_data = True
+
+        # NR
+        for nr_entry in entry["nr_info"]:
+            arfcn = util.clean_signal(nr_entry["nrarfcn"])
+            yield overview + (
+                "nr-SignalStrAPI" if nr_entry["isSignalStrAPI"] else "nr",
+                util.clean_signal(nr_entry["nrPci"]),
+                util.clean_signal(nr_entry["nci"]),
+                arfcn,
+                cell_helper.nrarfcn_to_band(
+                    arfcn, reg=cell_helper.REGION[options.region]),
+                cell_helper.nrarfcn_to_freq(arfcn),
+                "NaN",
+                util.clean_signal(nr_entry["ssRsrp"]),
+                util.clean_signal(nr_entry["ssRsrq"]),
+                util.clean_signal(nr_entry["ssSinr"]),
+                "primary" if nr_entry["status"] == "primary" else "other",
+            )
+            has_data = True
+
+        # Rest of LTE
+        lte_others = [val for val in entry["cell_info"] if val != lte_primary]
+        for lte_entry in lte_others:
+            earfcn = util.clean_signal(lte_entry["earfcn"])
+            yield overview + (
+                "lte",
+                util.clean_signal(lte_entry["pci"]),
+                util.clean_signal(lte_entry["ci"]),
+                earfcn,
+                cell_helper.earfcn_to_band(earfcn),
+                cell_helper.earfcn_to_freq(earfcn),
+                util.clean_signal(lte_entry["width"]),
+                util.clean_signal(lte_entry["rsrp"]),
+                util.clean_signal(lte_entry["rsrq"]),
+                util.clean_signal(lte_entry["rssi"]),
+                "other",
+            )
+            has_data = True
+
+        if not has_data:
+            yield overview + EMPTY_CELL
+
+
+def convert_cellular(records, options=None):
+    # Rows of COLUMNS, one per cell, for an iterable of SigCap entries,
+    # given as the entries are consumed. options is an argparse Namespace,
+    # a dict or None, read for the keys of OPTIONS.
+    options = util.make_options(OPTIONS, options)
+    for sigcap in util.iter_batches(records, BATCH_SIZE):
+        # If filter exist, filter the sigcap object
+        if (options.filter is not None):
+            with profiler.stage("filter"):
+                sigcap = filter_json.filter_batch(options.filter, sigcap)
+            logging.info(f"After filter, # of data: {len(sigcap)}")
+        yield from _iter_rows(sigcap, options)
@@ -0,0 +1,144 @@
+import json
+import logging
+import numpy as np
+import os
+from pathlib import Path
+
+VERSION = 1
+SCHEMA_FILE = "columns.json"
+SCHEMA_KEY = "schema"
+# Placeholders the converters write for missing values
+MISSING = ("NaN", "N/A")
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def _is_missing(val):
+    return val is None or (isinstance(val, str) and val in MISSING)
+
+
+def _encode_column(values):
+    # Pick the narrowest type that holds every value of a column: bool,
+    # int64, float64 (missing values as NaN, bools as 0/1), or else strings
+    # dictionary-encoded as int32 codes (-1 if missing) into categories
+    has_missing = False
+    all_bool = True
+    all_int = True
+    for val in values:
+        if (_is_missing(val)):
+            has_missing = True
+        elif (isinstance(val, (bool, np.bool_))):
+            pass
+        elif (isinstance(val, (int, np.integer))):
+            all_bool = False
+            if (abs(val) > INT64_MAX):
+                all_int = False
+        elif (isinstance(val, (float, np.floating))):
+            all_bool = False
+            all_int = False
+        else:
+            return _encode_category(values)
+
+    if (not has_missing and len(values) > 0):
+        if (all_bool):
+            return "bool", np.array(values, dtype=np.bool_), None
+        if (all_int):
+            return "int", np.array(values, dtype=np.int64), None
+    return "float", np.array(
+        [np.nan if _is_missing(val) else val for val in values],
+        dtype=np.float64), None
+
+
+def _encode_category(values):
+    lookup = dict()
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, val in enumerate(values):
+        if (_is_missing(val)):
+            codes[i] = -1
+            continue
+        val = str(val)
+        code = lookup.get(val)
+        if (code is None):
+            code = lookup[val] = len(lookup)
+        codes[i] = code
+    categories = np.array(list(lookup), dtype=str)
+    if (len(lookup) == 0):
+        categories = np.array([], dtype="U1")
+    return "category", codes, categories
+
+
+# Collects rows, sequences of values in the order of fieldnames, and
+# writes each column as a typed NumPy array, either into a single .npz file
+# or into a folder of .npy files that np.load can memory-map. Columns are
+# stored as c<i>.npy (and c<i>_categories.npy for strings) next to a JSON
+# schema with the column names and types.
+class ColumnWriter:
+    def __init__(self, path, fieldnames, layout="npz"):
+        self.path = Path(path)
+        self.layout = layout
+        self.fieldnames = list(fieldnames)
+        self.columns = [list() for _ in self.fieldnames]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        for column, val in zip(self.columns, row):
+            column.append(val)
+        self.count += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def close(self):
+        schema = {"version": VERSION, "rows": self.count, "columns": []}
+        arrays = dict()
+        for i, (name, values) in enumerate(zip(self.fieldnames,
+                                               self.columns)):
+            kind, data, categories = _encode_column(values)
+            key = f"c{i}"
+            arrays[key] = data
+            if (categories is not None):
+                arrays[f"{key}_categories"] = categories
+            schema["columns"].append({"name": name, "kind": kind, "key": key})
+            logging.debug(f"Column {name}: {kind}")
+
+        if (self.layout == "npz"):
+            arrays[SCHEMA_KEY] = np.array(json.dumps(schema))
+            np.savez_compressed(self.path, **arrays)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            for key, data in arrays.items():
+                np.save(self.path / f"{key}.npy", data)
+            with open(self.path / SCHEMA_FILE, "w") as schema_file:
+                json.dump(schema, schema_file, indent=2)
+        self.columns = [list() for _ in self.fieldnames]
+
+
+def load(path, mmap_mode=None):
+    # Columns written by ColumnWriter, by name. String columns are given as
+    # (codes, categories), so categories[codes] gives the values back
+    # except where a code is -1. mmap_mode only applies to .npy folders.
+    path = Path(path)
+    if (path.is_dir()):
+        with open(path / SCHEMA_FILE) as schema_file:
+            schema = json.load(schema_file)
+
+        def get(key):
+            return np.load(path / f"{key}.npy", mmap_mode=mmap_mode)
+    else:
+        arrays = np.load(path)
+        schema = json.loads(str(arrays[SCHEMA_KEY]))
+
+        def get(key):
+            return arrays[key]
+
+    columns = dict()
+    for column in schema["columns"]:
+        if (column["kind"] == "category"):
+            columns[column["name"]] = (
+                get(column["key"]), get(f"{column['key']}_categories"))
+        else:
+            columns[column["name"]] = get(column["key"])
+    return columns
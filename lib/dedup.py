@@ -0,0 +1,36 @@
+from collections import deque
+
+
+# Timestamps already seen from each device, to skip repeated records. With
+# a window (in the same unit as the timestamps), timestamps older than the
+# latest one of a device by more than the window are forgotten, which only
+# gives the same result as keeping everything if the input is time-ordered.
+class TimestampDedup:
+    def __init__(self, window=None):
+        self.window = window
+        self.seen = dict()
+        self.order = dict()
+        self.latest = dict()
+
+    def __len__(self):
+        return sum(len(val) for val in self.seen.values())
+
+    def is_duplicate(self, device, timestamp):
+        # Returns True for a timestamp seen before, otherwise records it
+        seen = self.seen.get(device)
+        if (seen is None):
+            seen = self.seen[device] = set()
+        if (timestamp in seen):
+            return True
+        seen.add(timestamp)
+
+        if (self.window is not None):
+            order = self.order.get(device)
+            if (order is None):
+                order = self.order[device] = deque()
+            order.append(timestamp)
+            latest = max(self.latest.get(device, timestamp), timestamp)
+            self.latest[device] = latest
+            while (order[0] < latest - self.window):
+                seen.discard(order.popleft())
+        return False
@@ -0,0 +1,199 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+from lib import filter_json
+from lib import loader
+from lib import util
+from lib import wide
+import logging
+import os
+from pathlib import Path
+
+VERSION = 2
+# Members whose distinct values are kept per file, for pruning filters
+VALUE_KEYS = ["uuid", "opName"]
+MAX_KEYS = ["max_lte", "max_nr", "max_wifi_2.4", "max_wifi_5", "max_wifi_6"]
+
+
+def _fingerprint(file):
+    stat = loader.stat_file(file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def summarize_file(file):
+    size, mtime_ns = _fingerprint(file)
+    summary = {
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "count": 0,
+        "datetime_min": None,
+        "datetime_max": None,
+        "values": {key: set() for key in VALUE_KEYS},
+        "operators": set(),
+    }
+    summary.update({key: -1 for key in MAX_KEYS})
+    time_min = None
+    time_max = None
+    has_time = True
+
+    for entry in loader.iter_file(file):
+        summary["count"] += 1
+
+        if (has_time):
+            try:
+                timestamp = util.parse_timestamp(entry["datetimeIso"])
+            except (KeyError, TypeError, ValueError, IndexError):
+                # Can't bound the time range of this file
+                has_time = False
+            else:
+                if (time_min is None or timestamp < time_min):
+                    time_min = timestamp
+                    summary["datetime_min"] = entry["datetimeIso"]
+                if (time_max is None or timestamp > time_max):
+                    time_max = timestamp
+                    summary["datetime_max"] = entry["datetimeIso"]
+
+        for key in VALUE_KEYS:
+            values = summary["values"][key]
+            if (values is None or key not in entry):
+                continue
+            if (isinstance(entry[key], (list, dict))):
+                summary["values"][key] = None
+            else:
+                values.add(entry[key])
+
+        try:
+            summary["operators"].add(util.get_operator_name(entry))
+        except KeyError:
+            pass
+
+        # Same counts as the wide converter keeps in update_max_counts
+        summary["max_lte"] = max(summary["max_lte"],
+                                 len(entry.get("cell_info", [])))
+        summary["max_nr"] = max(summary["max_nr"],
+                                len(entry.get("nr_info", [])))
+        wifi_counts = {"2.4": 0, "5": 0, "6": 0}
+        for wifi_entry in entry.get("wifi_info", []):
+            if not wifi_entry["connected"]:
+                wifi_counts[wide.get_band(wifi_entry["primaryFreq"])] += 1
+        for freq_code, count in wifi_counts.items():
+            key = f"max_wifi_{freq_code}"
+            summary[key] = max(summary[key], count)
+
+    if (not has_time):
+        summary["datetime_min"] = None
+        summary["datetime_max"] = None
+    summary["values"] = {
+        key: None if values is None else sorted(values, key=str)
+        for key, values in summary["values"].items()}
+    summary["operators"] = sorted(summary["operators"])
+    return summary
+
+
+def _date_can_match(summary, date_filter):
+    # Only ">" and "<" bounds are checked against the time range, anything
+    # else is assumed to match
+    if (summary["datetime_min"] is None):
+        return True
+    if (not isinstance(date_filter, list)):
+        date_filter = [date_filter]
+    for curr_filter in date_filter:
+        if (not isinstance(curr_filter, str)):
+            continue
+        match curr_filter[0:1]:
+            case ">":
+                bound = summary["datetime_max"]
+            case "<":
+                bound = summary["datetime_min"]
+            case _:
+                continue
+        match = filter_json.compile_filter({"datetimeIso": curr_filter})
+        if (not match({"datetimeIso": bound})):
+            return False
+    return True
+
+
+def _filter_can_match(summary, filter_obj):
+    if (not isinstance(filter_obj, dict)):
+        return True
+    for param in filter_obj:
+        if (param == "datetimeIso"):
+            if (not _date_can_match(summary, filter_obj[param])):
+                return False
+        elif (summary["values"].get(param) is not None):
+            match = filter_json.compile_filter({param: filter_obj[param]})
+            if (not any(match({param: val})
+                        for val in summary["values"][param])):
+                return False
+    return True
+
+
+# Summary of each input file (time range, uuids, operators, entry count and
+# max # of cells/APs), stored as JSON. A summary is only used while the
+# file still has the size and mtime it had when it was summarized.
+class FileIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.files = dict()
+        if (self.path.is_file()):
+            with open(self.path) as index_file:
+                index_obj = json.load(index_file)
+            if (index_obj.get("version") == VERSION):
+                self.files = index_obj["files"]
+            else:
+                logging.warning(f"Ignoring index {self.path} with a "
+                                f"different version")
+
+    def get(self, file):
+        summary = self.files.get(os.path.abspath(file))
+        if (summary is None):
+            return None
+        try:
+            if (_fingerprint(file) != (summary["size"],
+                                       summary["mtime_ns"])):
+                return None
+        except FileNotFoundError:
+            return None
+        return summary
+
+    def update(self, input_files, workers=1):
+        # Summarize new or changed files and drop files that are gone
+        input_files = [os.path.abspath(file) for file in input_files]
+        stale = [file for file in input_files if self.get(file) is None]
+        if (workers > 1):
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                summaries = list(executor.map(summarize_file, stale,
+                                              chunksize=16))
+        else:
+            summaries = [summarize_file(file) for file in stale]
+        kept = set(input_files)
+        self.files = {file: summary for file, summary in self.files.items()
+                      if file in kept}
+        self.files.update(zip(stale, summaries))
+        return len(stale)
+
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as index_file:
+            json.dump({"version": VERSION, "files": self.files}, index_file)
+        os.replace(tmp_path, self.path)
+
+    def can_match(self, file, filter_list):
+        summary = self.get(file)
+        if (summary is None):
+            return True
+        if (not isinstance(filter_list, list)):
+            filter_list = [filter_list]
+        return any(_filter_can_match(summary, filter_obj)
+                   for filter_obj in filter_list)
+
+    def max_counts(self, input_files):
+        # Max # of cells/APs over all files, or None if any file has no
+        # up-to-date summary
+        counts = {key: -1 for key in MAX_KEYS}
+        for file in input_files:
+            summary = self.get(file)
+            if (summary is None):
+                return None
+            for key in MAX_KEYS:
+                counts[key] = max(counts[key], summary[key])
+        return counts
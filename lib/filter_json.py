@@ -1,85 +1,142 @@
 from lib import util
+import numpy as np
 
 OPERAND_LIST = ["=", "~", ">", "<"]
+# Largest integer a float64 column can hold without losing precision
+MAX_EXACT_FLOAT_INT = 2 ** 53
 
 
-def compare(filter_obj, target_obj, is_date=False):
-    ret = False
+def _is_date_param(param):
+    return (param == 'datetimeIso'
+            or param == 'local_datetime')
+
+
+def _always_true(target_obj):
+    return True
+
+
+def _parse_value(filter_obj, is_date):
+    # Check first char from filter_obj
+    operand = ""
+    if (isinstance(filter_obj, str)):
+        operand = filter_obj[0:1]
+    # If operand is valid, go ahead and cut filter_obj
+    if (operand in OPERAND_LIST):
+        filter_obj = filter_obj[1:]
+
+    # Try to parse filter obj as int
+    try:
+        filter_obj = int(filter_obj)
+    except ValueError:
+        # do nothing
+        pass
+
+    if (is_date):
+        filter_obj = util.parse_timestamp(filter_obj)
+    elif (filter_obj == "undefined"):
+        filter_obj = None
+    return operand, filter_obj
+
+
+def _compile_value(filter_obj, is_date):
+    operand, value = _parse_value(filter_obj, is_date)
+
+    # Special case if compared data is date, the target still needs to be
+    # parsed for every record
+    if (is_date):
+        parse = util.parse_timestamp
+        match operand:
+            case "~":
+                return lambda target_obj: value != parse(target_obj)
+            case ">":
+                return lambda target_obj: value < parse(target_obj)
+            case "<":
+                return lambda target_obj: value > parse(target_obj)
+            case _:
+                return lambda target_obj: value == parse(target_obj)
+
+    # Special case if obj is string: substring match against string targets
+    if (isinstance(value, str)):
+        match operand:
+            case "~":
+                return lambda target_obj: (
+                    value not in target_obj if isinstance(target_obj, str)
+                    else value != target_obj)
+            case ">":
+                return lambda target_obj: (
+                    value in target_obj if isinstance(target_obj, str)
+                    else value < target_obj)
+            case "<":
+                return lambda target_obj: (
+                    value in target_obj if isinstance(target_obj, str)
+                    else value > target_obj)
+            case _:
+                return lambda target_obj: (
+                    value in target_obj if isinstance(target_obj, str)
+                    else value == target_obj)
+    match operand:
+        case "~":
+            return lambda target_obj: value != target_obj
+        case ">":
+            return lambda target_obj: value < target_obj
+        case "<":
+            return lambda target_obj: value > target_obj
+        case _:
+            return lambda target_obj: value == target_obj
+
 
+def _compile(filter_obj, is_date=False):
     if (isinstance(filter_obj, dict)):
-        # If object, iterate members
-        ret = True
-        for param in filter_obj:
-            # If target_obj is array, iterate over target_obj's entries
-            if (isinstance(target_obj, dict) and param in target_obj):
-                if (isinstance(target_obj[param], list)):
-                    tempRet = False
-                    for curr_target in target_obj[param]:
-                        tempRet = tempRet or compare(
-                            filter_obj[param],
-                            curr_target,
-                            (param == 'datetimeIso'
-                                or param == 'local_datetime'))
-                    ret = ret and tempRet
-                else:
-                    ret = ret and compare(
-                        filter_obj[param],
-                        target_obj[param],
-                        (param == 'datetimeIso'
-                            or param == 'local_datetime'))
-            else:
-                ret = False
+        # If object, every member must match. Date members are the most
+        # expensive to check, so they go last.
+        params = sorted(
+            [(param, _compile(filter_obj[param], _is_date_param(param)))
+             for param in filter_obj],
+            key=lambda x: _is_date_param(x[0]))
+        if (len(params) == 0):
+            return _always_true
+
+        def match_dict(target_obj):
+            if (not isinstance(target_obj, dict)):
+                return False
+            for param, match in params:
+                if (param not in target_obj):
+                    return False
+                target_val = target_obj[param]
+                # If target_obj is array, any of its entries may match
+                if (isinstance(target_val, list)):
+                    if (not any(match(val) for val in target_val)):
+                        return False
+                elif (not match(target_val)):
+                    return False
+            return True
+        return match_dict
     elif (isinstance(filter_obj, list)):
         # If filter_obj is array, do exclusive filter_obj on its entries
         # (assuming target_obj is neither array nor object)
-        ret = True
-        for curr_filter in filter_obj:
-            ret = ret and compare(curr_filter, target_obj, is_date)
+        matches = [_compile(curr_filter, is_date)
+                   for curr_filter in filter_obj]
+        if (len(matches) == 1):
+            return matches[0]
+        return lambda target_obj: all(
+            match(target_obj) for match in matches)
     else:
-        # Check first char from filter_obj
-        operand = ""
-        if (isinstance(filter_obj, str)):
-            operand = filter_obj[0:1]
-        # If operand is valid, go ahead and cut filter_obj
-        if (operand in OPERAND_LIST):
-            filter_obj = filter_obj[1:]
-
-        # Try to parse filter obj as int
-        try:
-            filter_obj = int(filter_obj)
-        except ValueError:
-            # do nothing
-            pass
-
-        # Special case if compared data is date
-        if (is_date):
-            filter_obj = util.create_sigcap_timestamp(filter_obj)
-            target_obj = util.create_sigcap_timestamp(target_obj)
-        elif (filter_obj == "undefined"):
-            filter_obj = None
-
-        # Special case if obj is string
-        if (isinstance(target_obj, str) and isinstance(filter_obj, str)):
-            match operand:
-                case "=":
-                    ret = filter_obj in target_obj
-                case "~":
-                    ret = filter_obj not in target_obj
-                case _:
-                    ret = filter_obj in target_obj
-        else:
-            match operand:
-                case "=":
-                    ret = (filter_obj == target_obj)
-                case "~":
-                    ret = (filter_obj != target_obj)
-                case ">":
-                    ret = (filter_obj < target_obj)
-                case "<":
-                    ret = (filter_obj > target_obj)
-                case _:
-                    ret = (filter_obj == target_obj)
-    return ret
+        return _compile_value(filter_obj, is_date)
+
+
+def compile_filter(filter_list):
+    # Turn a filter (or list of filters, any of which may match) into a
+    # predicate taking a single record. Constants are parsed once here.
+    if (not isinstance(filter_list, list)):
+        filter_list = [filter_list]
+    matches = [_compile(filter_obj) for filter_obj in filter_list]
+    if (len(matches) == 1):
+        return matches[0]
+    return lambda target_obj: any(match(target_obj) for match in matches)
+
+
+def compare(filter_obj, target_obj, is_date=False):
+    return _compile(filter_obj, is_date)(target_obj)
 
 
 def filter_array(filter_list, target_list, is_reverse=False):
@@ -92,11 +149,141 @@ def filter_array(filter_list, target_list, is_reverse=False):
     # since this is inclusive, it may outputs 2 or more
     # same datapoints depends on the filter_lists
     for filter_obj in filter_list:
+        match = _compile(filter_obj)
         for target_obj in target_list:
-            result = compare(filter_obj, target_obj)
+            result = match(target_obj)
             if (is_reverse):
                 result = not result
             if (result):
                 output_list.append(target_obj)
 
     return output_list
+
+
+def filter_any(filter_list, target_list, is_reverse=False):
+    # Single pass over target_list keeping, in order, every target that
+    # matches at least one filter, each of them only once
+    match = compile_filter(filter_list)
+    return [target_obj for target_obj in target_list
+            if match(target_obj) != is_reverse]
+
+
+# Vectorized evaluation: members referenced by the filter are pulled out of
+# a whole batch of records as columns. Numeric columns are compared as NumPy
+# arrays, other columns are dictionary-encoded so the predicate only runs
+# once per distinct value. List members keep the per-record path.
+_MISSING = object()
+
+
+def _take(values, idx):
+    if (len(idx) == len(values)):
+        return values
+    return [values[i] for i in idx]
+
+
+def _compare_array(operand, value, arr):
+    match operand:
+        case "~":
+            return value != arr
+        case ">":
+            return value < arr
+        case "<":
+            return value > arr
+        case _:
+            return value == arr
+
+
+def _value_mask(filter_obj, values, is_date):
+    operand, value = _parse_value(filter_obj, is_date)
+    types = set(map(type, values))
+
+    # Dates are compared as epoch ns, parsed for the whole column at once
+    if (is_date and types == {str}):
+        return _compare_array(operand, value, util.parse_timestamps(values))
+
+    if (not is_date
+            and types <= {int, float, bool}
+            and isinstance(value, (int, float))):
+        arr = np.array(values)
+        if (arr.dtype.kind in "biu"
+                or (arr.dtype.kind == "f"
+                    and all(abs(val) <= MAX_EXACT_FLOAT_INT
+                            for val in values if type(val) is int))):
+            return _compare_array(operand, value, arr)
+
+    match = _compile_value(filter_obj, is_date)
+    try:
+        lookup = {val: match(val) for val in set(values)}
+    except TypeError:
+        # Unhashable values
+        return np.fromiter(map(match, values), dtype=bool,
+                           count=len(values))
+    return np.fromiter(map(lookup.__getitem__, values), dtype=bool,
+                       count=len(values))
+
+
+def _mask(filter_obj, values, is_date=False):
+    if (isinstance(filter_obj, dict)):
+        if (len(filter_obj) == 0):
+            return np.ones(len(values), dtype=bool)
+        mask = np.fromiter(map(_is_dict, values), dtype=bool,
+                           count=len(values))
+        for param in sorted(filter_obj, key=_is_date_param):
+            # Only look at the records still matching
+            idx = np.flatnonzero(mask)
+            if (len(idx) == 0):
+                break
+            column = [val.get(param, _MISSING)
+                      for val in _take(values, idx)]
+            types = set(map(type, column))
+            if (list not in types and type(_MISSING) not in types):
+                mask[idx] = _mask(filter_obj[param], column,
+                                  _is_date_param(param))
+                continue
+
+            sub_mask = np.zeros(len(column), dtype=bool)
+            scalar_idx = [i for i, val in enumerate(column)
+                          if val is not _MISSING and type(val) is not list]
+            list_idx = [i for i, val in enumerate(column)
+                        if type(val) is list]
+            if (len(scalar_idx) > 0):
+                sub_mask[scalar_idx] = _mask(
+                    filter_obj[param], _take(column, scalar_idx),
+                    _is_date_param(param))
+            if (len(list_idx) > 0):
+                # If target_obj is array, any of its entries may match
+                match = _compile(filter_obj[param], _is_date_param(param))
+                sub_mask[list_idx] = [
+                    any(match(val) for val in column[i]) for i in list_idx]
+            mask[idx] = sub_mask
+        return mask
+    elif (isinstance(filter_obj, list)):
+        mask = np.ones(len(values), dtype=bool)
+        for curr_filter in filter_obj:
+            idx = np.flatnonzero(mask)
+            if (len(idx) == 0):
+                break
+            mask[idx] = _mask(curr_filter, _take(values, idx), is_date)
+        return mask
+    else:
+        return _value_mask(filter_obj, values, is_date)
+
+
+def _is_dict(val):
+    return isinstance(val, dict)
+
+
+def filter_batch(filter_list, target_list, is_reverse=False):
+    # Same result as filter_any, evaluated over the whole batch at once
+    if (not isinstance(filter_list, list)):
+        filter_list = [filter_list]
+    mask = np.zeros(len(target_list), dtype=bool)
+    for filter_obj in filter_list:
+        # Records matching an earlier filter need no further checks
+        idx = np.flatnonzero(~mask)
+        if (len(idx) == 0):
+            break
+        mask[idx] = _mask(filter_obj, _take(target_list, idx))
+    if (is_reverse):
+        mask = ~mask
+    return [target_list[i] for i in np.flatnonzero(mask)]
@@ -1,14 +1,278 @@
+import bz2
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import functools
+import gzip
+import io
+import itertools
 import json
+from lib import profiler
+import logging
+import lzma
+import os
+from pathlib import Path
 import re
+import zipfile
 
+READ_SIZE = 1 << 16
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+INPUT_FILE = re.compile(r"\.(txt|json)(\.(gz|bz2|xz))?$", re.IGNORECASE)
+ZIP_FILE = re.compile(r"\.zip$", re.IGNORECASE)
+# Members of a zip bundle are listed as "<bundle>.zip/<member>"
+ZIP_MEMBER = re.compile(r"^(.*?\.zip)/(.+)$", re.IGNORECASE)
+OPENERS = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+JSON_BACKENDS = ["auto", "stdlib", "orjson", "ujson"]
 
-def load_json(input_dir, callback, options=None):
+# Installed decoders of a whole file read as bytes, fastest first
+DECODERS = dict()
+try:
+    import orjson
+    DECODERS["orjson"] = orjson.loads
+except ImportError:
+    pass
+try:
+    import ujson
+    DECODERS["ujson"] = ujson.loads
+except ImportError:
+    pass
 
-    re_exts = re.compile(r"\.(txt|json)$")
-    list_files = [
-        str(p) for p in
-        input_dir.rglob("*")
-        if re_exts.search(str(p))]
+
+def _iter_json(item_file):
+    # Yield the elements of a top-level JSON array one at a time, reading
+    # the file in chunks. Any other top-level value is yielded as is.
+    decoder = json.JSONDecoder()
+    buf = item_file.read(READ_SIZE)
+    pos = WHITESPACE.match(buf).end()
+    if (not buf.startswith("[", pos)):
+        yield json.loads(buf + item_file.read())
+        return
+
+    pos += 1
+    read_size = READ_SIZE
+    eof = False
+    expect_value = True
+    after_comma = False
+    while True:
+        pos = WHITESPACE.match(buf, pos).end()
+        if (pos < len(buf)):
+            char = buf[pos]
+            if (char == "]"):
+                if (after_comma):
+                    raise json.JSONDecodeError(
+                        "Expecting value", buf, pos)
+                rest = buf[pos + 1:] + item_file.read()
+                if (rest.strip(" \t\n\r")):
+                    raise json.JSONDecodeError("Extra data", rest, 0)
+                return
+            if (not expect_value):
+                if (char != ","):
+                    raise json.JSONDecodeError(
+                        "Expecting ',' delimiter", buf, pos)
+                pos += 1
+                expect_value = True
+                after_comma = True
+                continue
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                # A number cut by the end of the buffer decodes as a
+                # shorter one (10. as 10), so only trust a value once the
+                # delimiter after it was read (or at EOF)
+                end = WHITESPACE.match(buf, end).end()
+                if (buf.startswith((",", "]"), end) or eof):
+                    yield obj
+                    pos = end
+                    expect_value = False
+                    after_comma = False
+                    continue
+            except json.JSONDecodeError:
+                if (eof):
+                    raise
+        elif (eof):
+            raise json.JSONDecodeError("Unterminated array", buf, pos)
+
+        # Need more data: drop what was consumed and grow the read size so
+        # a single large element is not re-decoded too many times
+        chunk = item_file.read(read_size)
+        eof = (len(chunk) < read_size)
+        buf = buf[pos:] + chunk
+        pos = 0
+        read_size = max(read_size, len(buf))
+
+
+def split_member(file):
+    # (archive, member) for a file inside a zip bundle, else (file, None)
+    match = ZIP_MEMBER.match(str(file))
+    if (match is not None and os.path.isfile(match[1])):
+        return match[1], match[2]
+    return str(file), None
+
+
+def stat_file(file):
+    # Members of a bundle change with the bundle, so stat the bundle
+    return os.stat(split_member(file)[0])
+
+
+def _member_opener(member, binary=False):
+    # Zip members can themselves be compressed
+    opener = OPENERS.get(Path(member).suffix.lower())
+    if (opener is None):
+        return io.TextIOWrapper
+    return lambda member_file: opener(member_file,
+                                      "rb" if binary else "rt")
+
+
+@contextmanager
+def open_file(file, binary=False):
+    # Text (or binary) stream of an input file, decompressed on the fly
+    path, member = split_member(file)
+    if (member is not None):
+        with zipfile.ZipFile(path) as archive, \
+                archive.open(member) as member_file:
+            if (binary and Path(member).suffix.lower() not in OPENERS):
+                yield member_file
+                return
+            with _member_opener(member, binary)(member_file) as item_file:
+                yield item_file
+        return
+    opener = OPENERS.get(Path(path).suffix.lower(), open)
+    with opener(path, "rb" if binary else "rt") as item_file:
+        yield item_file
+
+
+def resolve_backend(backend="auto"):
+    # auto is the fastest installed decoder, and a decoder that is not
+    # installed falls back to the stdlib
+    if (backend == "auto"):
+        return next(iter(DECODERS), "stdlib")
+    if (backend != "stdlib" and backend not in DECODERS):
+        logging.warning(f"JSON backend {backend} is not installed, "
+                        "using stdlib")
+        return "stdlib"
+    return backend
+
+
+def _decode_file(file, backend="stdlib"):
+    decode = DECODERS.get(backend)
+    if (decode is None):
+        with open_file(file) as item_file:
+            yield from _iter_json(item_file)
+        return
+
+    # Fast decoders take the whole file at once
+    with open_file(file, binary=True) as item_file:
+        data = item_file.read()
+    try:
+        obj = decode(data)
+    except ValueError:
+        # Left to the stdlib are documents these decoders reject, like NaN
+        # or integers over 64 bits, so the result (or error) is the same
+        obj = json.loads(data)
+    if (isinstance(obj, list)):
+        yield from obj
+    else:
+        yield obj
+
+
+def iter_file(file, cache=None, backend="stdlib"):
+    if (cache is None):
+        return _decode_file(file, backend)
+    return cache.entries(file,
+                         functools.partial(_decode_file, backend=backend))
+
+
+def _read_file(file, cache=None, backend="stdlib"):
+    return list(iter_file(file, cache, backend))
+
+
+def _iter_decoded(input_files, workers=1, cache=None, backend="stdlib"):
+    if (workers <= 1):
+        for file in input_files:
+            yield file, iter_file(file, cache, backend)
+        return
+
+    # Keep a bounded window of files in flight and hand the results back
+    # in submission order, so batches stay in deterministic file order
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        files = iter(input_files)
+        pending = deque()
+        for file in files:
+            pending.append(
+                (file, executor.submit(_read_file, file, cache, backend)))
+            if (len(pending) >= workers * 2):
+                break
+        while pending:
+            file, future = pending.popleft()
+            next_file = next(files, None)
+            if (next_file is not None):
+                pending.append(
+                    (next_file,
+                     executor.submit(_read_file, next_file, cache,
+                                     backend)))
+            yield file, future.result()
+
+
+def _list_members(bundle):
+    with zipfile.ZipFile(bundle) as archive:
+        return [
+            f"{bundle}/{info.filename}" for info in archive.infolist()
+            if not info.is_dir() and INPUT_FILE.search(info.filename)]
+
+
+def list_files(input_dir):
+    # Plain, gzip, bz2 and xz compressed logs, and the logs inside zip
+    # bundles
+    if (input_dir.is_file()):
+        if (ZIP_FILE.search(str(input_dir))):
+            return _list_members(input_dir)
+        return [str(input_dir)]
+    input_files = list()
+    for p in input_dir.rglob("*"):
+        if (INPUT_FILE.search(str(p))):
+            input_files.append(str(p))
+        elif (ZIP_FILE.search(str(p)) and p.is_file()):
+            input_files += _list_members(p)
+    return input_files
+
+
+def scan_files(input_dir, index=None, filter_obj=None, files=None):
+    # files, if given, keeps only those of the files found
+    with profiler.stage("scan"):
+        input_files = list_files(input_dir)
+        if (files is not None):
+            files = set(files)
+            input_files = [file for file in input_files if file in files]
+        # Skip files whose summary in the index shows no entry can pass
+        # the filter
+        if (index is not None and filter_obj is not None):
+            num_files = len(input_files)
+            input_files = [file for file in input_files
+                           if index.can_match(file, filter_obj)]
+            logging.info(f"Index skipped {num_files - len(input_files)} of "
+                         f"{num_files} files")
+    return input_files
+
+
+def iter_file_batches(file, cache=None, batch_size=1000, backend="stdlib"):
+    # Entries of a single file in lists of up to batch_size
+    entries = profiler.timed_iter("decode", iter_file(file, cache, backend))
+    while True:
+        batch = list(itertools.islice(entries, batch_size))
+        if (len(batch) == 0):
+            return
+        yield batch
+
+
+def load_json(input_dir, callback, options=None, workers=1, cache=None,
+              index=None, filter_obj=None, backend="stdlib", files=None):
+
+    input_files = scan_files(input_dir, index, filter_obj, files)
+    backend = resolve_backend(backend)
+    logging.info(f"Decoding JSON with {backend}")
 
     # print(list_files)
     MAX_NUM_OBJ = 5000
@@ -20,21 +284,19 @@ def load_json(input_dir, callback, options=None):
     if (options is not None):
         result_obj['options'] = options
 
-    # with list_files[0] as file:
-    for file in list_files:
-        with open(file) as item_file:
-            json_obj = json.load(item_file)
-            all_files.append(file)
-            if (isinstance(json_obj, list)):
-                all_obj += json_obj
-            else:
-                all_obj.append(json_obj)
+    # Entries are streamed out of each file, so a batch is handed over as
+    # soon as it is full, even in the middle of a large file
+    decoded = _iter_decoded(input_files, workers, cache, backend)
+    for file, entries in profiler.timed_iter("decode", decoded):
+        all_files.append(file)
+        for entry in profiler.timed_iter("decode", entries):
             if (len(all_obj) >= MAX_NUM_OBJ):
                 result_obj['files'] = all_files
                 result_obj['json'] = all_obj
                 callback(result_obj)
                 all_obj = []
-                all_files = []
+                all_files = [file]
+            all_obj.append(entry)
 
     if (len(all_obj) > 0):
         result_obj['files'] = all_files
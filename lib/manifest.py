@@ -0,0 +1,101 @@
+import json
+from lib import loader
+import logging
+import os
+from pathlib import Path
+
+# Version 2 outputs are sorted by time rather than by timestamp string, and
+# version 3 wide outputs are as wide as the Wi-Fi APs written to each band
+VERSION = 3
+SUFFIX = ".manifest.json"
+
+
+def default_path(output_file):
+    output_file = Path(output_file)
+    return output_file.with_name(output_file.name + SUFFIX)
+
+
+def _fingerprint(file):
+    stat = loader.stat_file(file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# Input files already converted into an output file, with the size and
+# mtime each had, and the options they were converted with, so a later run
+# only converts new files and merges their rows into the output. The layout
+# is whatever else the converter needs to extend the output, like the
+# column limits of the wide CSV.
+class Manifest:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.options = None
+        self.layout = None
+        self.files = dict()
+        self.pending = dict()
+        if (self.path.is_file()):
+            with open(self.path) as manifest_file:
+                manifest_obj = json.load(manifest_file)
+            if (manifest_obj.get("version") == VERSION):
+                self.options = manifest_obj["options"]
+                self.layout = manifest_obj["layout"]
+                self.files = manifest_obj["files"]
+            else:
+                logging.warning(f"Ignoring manifest {self.path} with a "
+                                f"different version")
+
+    def __len__(self):
+        return len(self.files)
+
+    def _can_extend(self, input_files, options):
+        if (self.options is None):
+            return False
+        if (self.options != options):
+            logging.info("Options changed since the last run")
+            return False
+        current = set(os.path.abspath(file) for file in input_files)
+        for file, fingerprint in self.files.items():
+            if (file not in current):
+                logging.info(f"{file} was removed since the last run")
+                return False
+            if (_fingerprint(file) != fingerprint):
+                logging.info(f"{file} was modified since the last run")
+                return False
+        return True
+
+    def plan(self, input_files, options, output_file):
+        # Input files still to be converted, or None if the output has to
+        # be rebuilt from all of them: the output is missing, the options
+        # changed, or a converted file was modified or removed, as its old
+        # rows cannot be taken out of the output. options must be JSON.
+        options = json.loads(json.dumps(options))
+        if (os.path.exists(output_file)
+                and self._can_extend(input_files, options)):
+            files = [file for file in input_files
+                     if os.path.abspath(file) not in self.files]
+        else:
+            self.files = dict()
+            self.layout = None
+            files = None
+        # Fingerprints are taken before converting, so a file modified
+        # while it is converted is converted again next time
+        self.pending = {
+            os.path.abspath(file): _fingerprint(file)
+            for file in (input_files if files is None else files)}
+        self.options = options
+        return files
+
+    def commit(self, layout=None):
+        # Record the files of the last plan as converted, along with the
+        # layout of the output if it changed
+        self.files.update(self.pending)
+        self.pending = dict()
+        if (layout is not None):
+            self.layout = layout
+
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as manifest_file:
+            json.dump({"version": VERSION, "options": self.options,
+                       "layout": self.layout, "files": self.files},
+                      manifest_file)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+from lib import columnar
+from lib import writer
+import logging
+import os
+from pathlib import Path
+import re
+
+PARTITION_BY = ["uuid", "date", "operator"]
+# Column each partitioning takes its value from, the date being the local
+# date of the timestamp
+COLUMNS = {"uuid": "uuid", "date": "timestamp", "operator": "operator"}
+MANIFEST_FILE = "partitions.json"
+EXTENSIONS = {"none": "", "gzip": ".gz", "bz2": ".bz2", "xz": ".xz"}
+UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def get_value(partition_by, val):
+    if (partition_by == "date"):
+        return str(val)[:10]
+    return str(val)
+
+
+def _file_names(values, suffix):
+    # A distinct file name for each value, safe on any file system
+    names = list()
+    taken = set()
+    for value in values:
+        base = UNSAFE.sub("_", value).strip("_.") or "unknown"
+        name = base
+        i = 1
+        while (name.lower() in taken):
+            i += 1
+            name = f"{base}-{i}"
+        taken.add(name.lower())
+        names.append(name + suffix)
+    return names
+
+
+def _track(rows, time_key, summary):
+    # Rows are sorted by time, so the first and last give the time range
+    for row in rows:
+        time = time_key(row)
+        if (summary["time_min"] is None):
+            summary["time_min"] = time
+        summary["time_max"] = time
+        summary["rows"] += 1
+        yield row
+
+
+def _write_partition(path, fieldnames, rows, time_key, output_format,
+                     compression):
+    summary = {"rows": 0, "time_min": None, "time_max": None}
+    rows = _track(rows, time_key, summary)
+    if (output_format == "csv"):
+        with writer.open_output(path, compression) as output_file:
+            writer.RowWriter(output_file, fieldnames).extend(rows)
+    else:
+        column_writer = columnar.ColumnWriter(path, fieldnames,
+                                              layout=output_format)
+        column_writer.extend(rows)
+        column_writer.close()
+    return summary
+
+
+def write_partitions(output_dir, partition_by, fieldnames, partitions,
+                     time_key, output_format="csv", compression="auto",
+                     workers=1):
+    # Write the sorted rows of each (value, rows) partition to its own file
+    # in output_dir, using threads as compression and file I/O release the
+    # GIL, and list the partitions in a JSON manifest next to them. rows
+    # should be lazy so that sorting also happens in the threads.
+    output_dir = Path(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    compression = writer.get_compression(output_dir, compression)
+    suffix = {
+        "csv": ".csv" + EXTENSIONS[compression],
+        "npz": ".npz",
+        "npy": "",
+    }[output_format]
+    names = _file_names([value for value, _ in partitions], suffix)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [
+            executor.submit(_write_partition, output_dir / name, fieldnames,
+                            rows, time_key, output_format, compression)
+            for name, (_, rows) in zip(names, partitions)]
+        summaries = list()
+        for name, (value, _), future in zip(names, partitions, futures):
+            summary = {"value": value, "file": name}
+            summary.update(future.result())
+            logging.info(f"Partition {value}: {summary['rows']} rows")
+            summaries.append(summary)
+
+    with open(output_dir / MANIFEST_FILE, "w") as manifest_file:
+        json.dump({"partition_by": partition_by, "format": output_format,
+                   "compression": compression, "columns": fieldnames,
+                   "partitions": summaries}, manifest_file, indent=2)
+    return summaries
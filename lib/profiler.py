@@ -0,0 +1,171 @@
+from collections import defaultdict
+from contextlib import nullcontext
+import functools
+import json
+from lib import cell_helper
+from lib import filter_json
+from lib import util
+from lib import wifi_helper
+import logging
+from pathlib import Path
+import time
+
+# Helpers called for every cell, AP or record, timed while profiling
+HOT_FUNCTIONS = [
+    (cell_helper, "earfcn_to_band"),
+    (cell_helper, "earfcn_to_freq"),
+    (cell_helper, "nrarfcn_to_band"),
+    (cell_helper, "nrarfcn_to_freq"),
+    (wifi_helper, "get_freq_code"),
+    (wifi_helper, "get_channel_from_freq"),
+    (util, "clean_signal"),
+    (filter_json, "filter_batch"),
+]
+
+_NULL_STAGE = nullcontext()
+_profiler = None
+
+
+# Wall time of the pipeline stages and of the hot helpers. Timed sections
+# nest, the time of a section without its nested sections is its self
+# time, and each path of nested sections is kept for the collapsed stacks.
+class Profiler:
+    def __init__(self):
+        self.stages = defaultdict(lambda: [0, 0.0, 0.0])
+        self.calls = defaultdict(lambda: [0, 0.0, 0.0])
+        self.folded = defaultdict(float)
+        self.stack = list()
+        self.patched = list()
+
+    def _enter(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, totals):
+        name, start, child = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        path = ";".join([frame[0] for frame in self.stack] + [name])
+        self.folded[path] += elapsed - child
+        if (len(self.stack) > 0):
+            self.stack[-1][2] += elapsed
+        total = totals[name]
+        total[0] += 1
+        total[1] += elapsed
+        total[2] += elapsed - child
+
+    def stage(self, name):
+        return _Section(self, name, self.stages)
+
+    def timed_iter(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit(self.stages)
+            yield item
+
+    def _wrap(self, name, func, totals):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit(totals)
+
+        return wrapper
+
+    def timed(self, name, func):
+        return self._wrap(name, func, self.stages)
+
+    def instrument(self, module, attr):
+        func = getattr(module, attr)
+        name = f"{module.__name__.split('.')[-1]}.{attr}"
+        setattr(module, attr, self._wrap(name, func, self.calls))
+        self.patched.append((module, attr, func))
+
+    def restore(self):
+        for module, attr, func in reversed(self.patched):
+            setattr(module, attr, func)
+        self.patched = list()
+
+    def report(self):
+        def totals(items):
+            return {
+                name: {"count": val[0], "seconds": val[1],
+                       "self_seconds": val[2]}
+                for name, val in items.items()}
+
+        return {"stages": totals(self.stages), "calls": totals(self.calls)}
+
+    def write(self, path):
+        path = Path(path)
+        with open(path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+        # One "stage;function microseconds" line per stack, as read by
+        # flamegraph.pl and speedscope
+        folded_path = path.with_suffix(".folded")
+        with open(folded_path, "w") as folded_file:
+            for stack, seconds in sorted(self.folded.items()):
+                usec = round(seconds * 1e6)
+                if (usec > 0):
+                    folded_file.write(f"{stack} {usec}\n")
+        logging.info("Profile written to %s and %s", path, folded_path)
+
+
+class _Section:
+    def __init__(self, profiler, name, totals):
+        self.profiler = profiler
+        self.name = name
+        self.totals = totals
+
+    def __enter__(self):
+        self.profiler._enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self.totals)
+        return False
+
+
+def start():
+    # Only now are the hot helpers wrapped, so they cost nothing extra
+    # unless profiling
+    global _profiler
+    _profiler = Profiler()
+    for module, attr in HOT_FUNCTIONS:
+        _profiler.instrument(module, attr)
+    return _profiler
+
+
+def stop(path=None):
+    global _profiler
+    if (_profiler is None):
+        return None
+    profiler = _profiler
+    _profiler = None
+    profiler.restore()
+    if (path is not None):
+        profiler.write(path)
+    return profiler.report()
+
+
+def stage(name):
+    if (_profiler is None):
+        return _NULL_STAGE
+    return _profiler.stage(name)
+
+
+def timed(name, func):
+    if (_profiler is None):
+        return func
+    return _profiler.timed(name, func)
+
+
+def timed_iter(name, iterable):
+    if (_profiler is None):
+        return iterable
+    return _profiler.timed_iter(name, iterable)
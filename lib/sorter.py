@@ -0,0 +1,190 @@
+import heapq
+import itertools
+import logging
+import pickle
+import sys
+import tempfile
+
+SPILL_CHUNK = 1000
+# Streams merge_sorted merges at once, each holding a file open and up to a
+# batch of entries
+MERGE_GROUP = 64
+
+
+# Raised by merge_sorted for a stream found out of order
+class UnsortedError(ValueError):
+    pass
+
+
+def _approx_size(obj):
+    # Rough in-memory size of a row: the container plus its values, one
+    # level into nested lists/tuples/dicts. Keys are shared between rows.
+    size = sys.getsizeof(obj)
+    values = obj.values() if isinstance(obj, dict) else obj
+    for val in values:
+        size += sys.getsizeof(val)
+        if (isinstance(val, (list, tuple))):
+            for item in val:
+                size += sys.getsizeof(item)
+    return size
+
+
+def _write_run(rows):
+    # Temporary file of rows pickled a chunk at a time, for _read_run
+    run_file = tempfile.TemporaryFile(prefix="sigcap_sort_")
+    rows = iter(rows)
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, SPILL_CHUNK))
+            if (len(chunk) == 0):
+                return run_file
+            pickle.dump(chunk, run_file, protocol=pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        run_file.close()
+        raise
+
+
+def _read_run(run_file):
+    run_file.seek(0)
+    try:
+        while True:
+            yield from pickle.load(run_file)
+    except EOFError:
+        pass
+    finally:
+        run_file.close()
+
+
+# Collect rows and hand them back stably sorted by key. Without a memory
+# budget, rows are kept in a list and sorted in memory. With one (in MB),
+# rows are sorted and spilled to temporary files each time the estimated
+# size of the buffered rows reaches the budget, and the spilled runs are
+# k-way merged on the way out. Both give the same order as sorted().
+class RowSorter:
+    def __init__(self, key, memory_budget=None):
+        self.key = key
+        self.budget = (None if memory_budget is None
+                       else memory_budget * 1024 * 1024)
+        self.rows = list()
+        self.runs = list()
+        self.count = 0
+        self.row_size = None
+        self.max_rows = None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        self.rows.append(row)
+        self.count += 1
+        if (self.budget is None):
+            return
+        if (self.max_rows is None):
+            self.row_size = _approx_size(row)
+            self.max_rows = max(int(self.budget // self.row_size), 1)
+        if (len(self.rows) >= self.max_rows):
+            self._spill()
+            # Rows may grow over the run (e.g. more cells per entry), so
+            # re-estimate from the latest row for the next run
+            self.row_size = max(self.row_size, _approx_size(row))
+            self.max_rows = max(int(self.budget // self.row_size), 1)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def _spill(self):
+        self.rows.sort(key=self.key)
+        run_file = _write_run(self.rows)
+        logging.info(f"Spilled {len(self.rows)} rows to run "
+                     f"#{len(self.runs) + 1}")
+        self.runs.append(run_file)
+        self.rows = list()
+
+    def sorted(self):
+        # Nothing is sorted until the first row is taken, so the sort is
+        # timed by whatever takes the rows
+        self.rows.sort(key=self.key)
+        if (len(self.runs) == 0):
+            yield from self.rows
+            return
+
+        # Runs are merged in the order they were filled, so rows with equal
+        # keys keep their insertion order like a single stable sort
+        yield from heapq.merge(
+            *[_read_run(run_file) for run_file in self.runs],
+            self.rows,
+            key=self.key)
+
+
+# A RowSorter for each partition of the rows, as given by partition(row),
+# so each partition is sorted on its own. A memory budget is shared by all
+# partitions: once the buffered rows reach it, the partition buffering the
+# most rows is spilled.
+class PartitionSorter:
+    def __init__(self, partition, key, memory_budget=None):
+        self.partition = partition
+        self.key = key
+        self.budget = (None if memory_budget is None
+                       else memory_budget * 1024 * 1024)
+        self.sorters = dict()
+        self.count = 0
+        self.buffered = 0
+        self.row_size = None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        value = self.partition(row)
+        row_sorter = self.sorters.get(value)
+        if (row_sorter is None):
+            row_sorter = self.sorters[value] = RowSorter(self.key)
+        row_sorter.append(row)
+        self.count += 1
+        if (self.budget is None):
+            return
+        if (self.row_size is None):
+            self.row_size = _approx_size(row)
+        self.buffered += 1
+        if (self.buffered * self.row_size >= self.budget):
+            largest = max(self.sorters.values(), key=lambda val: len(val.rows))
+            self.buffered -= len(largest.rows)
+            largest._spill()
+            self.row_size = max(self.row_size, _approx_size(row))
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def partitions(self):
+        # (value, RowSorter) of each partition, in order of value
+        return sorted(self.sorters.items(), key=lambda val: val[0])
+
+
+def _check_sorted(name, rows, key):
+    prev = None
+    for row in rows:
+        curr = key(row)
+        if (prev is not None and curr < prev):
+            raise UnsortedError(f"{name} is not sorted, {curr} comes after "
+                             f"{prev}")
+        prev = curr
+        yield row
+
+
+def merge_sorted(streams, key):
+    # Merge (name, rows) streams that are each already sorted by key, and
+    # raise UnsortedError naming the first stream found out of order. Equal
+    # keys keep the order of the streams, like a stable sort of all rows.
+    # At most MERGE_GROUP streams are read at once: beyond that, each group
+    # of them is merged into a spilled run, and the runs merged the same way.
+    streams = [_check_sorted(name, rows, key) for name, rows in streams]
+    while (len(streams) > MERGE_GROUP):
+        logging.info(f"Merging {len(streams)} streams in groups of "
+                     f"{MERGE_GROUP}")
+        streams = [
+            _read_run(_write_run(heapq.merge(
+                *streams[i:i + MERGE_GROUP], key=key)))
+            for i in range(0, len(streams), MERGE_GROUP)]
+    yield from heapq.merge(*streams, key=key)
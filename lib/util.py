@@ -1,7 +1,28 @@
-from datetime import datetime
+from datetime import date, datetime, timezone
+import functools
+import itertools
 from os.path import isfile
 import json
 import numpy as np
+import re
+from types import SimpleNamespace
+
+# SigCap datetimeIso, "2023-05-01T12:49:05.000-0500", and the ISO format
+# datetime writes, "2023-05-01T12:49:04.900000-05:00"
+TIMESTAMP_FORMAT = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,9}))?"
+    r"([+-])(\d\d):?(\d\d)")
+# Layout of datetimeIso parsed by parse_timestamps as NumPy arrays, where 0
+# is any digit and + is either sign
+SIGCAP_LAYOUT = "0000-00-00T00:00:00.000+0000"
+TIMESTAMP_CACHE = 1 << 16
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NS = 10 ** 9
+MONTH_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+# Years whose timestamps fit in int64 nanoseconds
+MIN_YEAR = 1678
+MAX_YEAR = 2261
 
 
 def create_sigcap_timestamp(input_str):
@@ -14,6 +35,145 @@ def create_sigcap_timestamp(input_str):
     return datetime.fromisoformat(input_str).timestamp()
 
 
+def _parse_datetime(input_str):
+    # Any other timestamp datetime can parse, with the tz fix of
+    # create_sigcap_timestamp, as (epoch ns, UTC offset in seconds)
+    if (input_str[-5:-4] in ("+", "-") and input_str[-3:-2] != ":"):
+        input_str = input_str[:-2] + ":" + input_str[-2:]
+    timestamp = datetime.fromisoformat(input_str)
+    if (timestamp.tzinfo is None):
+        timestamp = timestamp.astimezone()
+    delta = timestamp - EPOCH
+    return ((delta.days * 86400 + delta.seconds) * NS
+            + delta.microseconds * 1000,
+            int(timestamp.utcoffset().total_seconds()))
+
+
+@functools.lru_cache(maxsize=TIMESTAMP_CACHE)
+def _parse(input_str):
+    match = TIMESTAMP_FORMAT.fullmatch(input_str)
+    if (match is None):
+        return _parse_datetime(input_str)
+    (year, month, day, hour, minute, second, fraction, sign, offset_hour,
+     offset_minute) = match.groups()
+    hour, minute, second = int(hour), int(minute), int(second)
+    if (hour > 23 or minute > 59 or second > 59):
+        raise ValueError(f"Invalid time in {input_str}")
+    days = date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL
+    offset = int(offset_hour) * 3600 + int(offset_minute) * 60
+    if (sign == "-"):
+        offset = -offset
+    timestamp = (days * 86400 + hour * 3600 + minute * 60 + second
+                 - offset) * NS
+    if (fraction is not None):
+        timestamp += int(fraction.ljust(9, "0"))
+    return timestamp, offset
+
+
+def parse_timestamp(input_str):
+    # Epoch time in ns of a timestamp string, cached as rows of an entry
+    # share its timestamp
+    return _parse(input_str)[0]
+
+
+def parse_utc_offset(input_str):
+    # UTC offset in seconds of a timestamp string
+    return _parse(input_str)[1]
+
+
+def timestamp_key(index):
+    # Sort key of rows by the timestamp string at index, in time order even
+    # if the UTC offsets differ
+    return lambda row: _parse(row[index])[0]
+
+
+def _digits(digits, start, length):
+    number = digits[:, start]
+    for i in range(start + 1, start + length):
+        number = number * 10 + digits[:, i]
+    return number
+
+
+def _days_from_civil(year, month, day):
+    # Days since the epoch of a date in the proleptic Gregorian calendar
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = ((153 * np.where(month > 2, month - 3, month + 9) + 2) // 5
+                   + day - 1)
+    day_of_era = (year_of_era * 365 + year_of_era // 4 - year_of_era // 100
+                  + day_of_year)
+    return era * 146097 + day_of_era - 719468
+
+
+def parse_timestamps(input_strs):
+    # parse_timestamp of many strings as an int64 array. Strings laid out
+    # exactly as SIGCAP_LAYOUT are parsed as arrays of characters, the rest
+    # one by one.
+    input_strs = list(input_strs)
+    timestamps = np.empty(len(input_strs), dtype=np.int64)
+    chars = np.array(input_strs)
+    width = len(SIGCAP_LAYOUT)
+    if (chars.dtype.kind != "U" or chars.itemsize // 4 < width
+            or len(input_strs) == 0):
+        fast = np.zeros(len(input_strs), dtype=bool)
+    else:
+        codes = chars.view(np.uint32).reshape(len(input_strs), -1)
+        layout = np.array([ord(char) for char in SIGCAP_LAYOUT])
+        is_digit = layout == ord("0")
+        digits = codes[:, :width].astype(np.int64) - ord("0")
+        sign = codes[:, SIGCAP_LAYOUT.index("+")]
+        fast = np.all(np.where(is_digit, (digits >= 0) & (digits <= 9),
+                               (codes[:, :width] == layout)
+                               | ((layout == ord("+"))
+                                  & (codes[:, :width] == ord("-")))),
+                      axis=1)
+        fast &= np.all(codes[:, width:] == 0, axis=1)
+
+        year = _digits(digits, 0, 4)
+        month = _digits(digits, 5, 2)
+        day = _digits(digits, 8, 2)
+        hour = _digits(digits, 11, 2)
+        minute = _digits(digits, 14, 2)
+        second = _digits(digits, 17, 2)
+        offset = _digits(digits, 24, 2) * 3600 + _digits(digits, 26, 2) * 60
+        offset = np.where(sign == ord("-"), -offset, offset)
+        # Anything out of range is left to datetime, to raise the same error
+        month_days = MONTH_DAYS[np.clip(month, 0, 12)] + (
+            (month == 2) & (year % 4 == 0)
+            & ((year % 100 != 0) | (year % 400 == 0)))
+        fast &= ((year >= MIN_YEAR) & (year <= MAX_YEAR)
+                 & (month >= 1) & (month <= 12)
+                 & (day >= 1) & (day <= month_days)
+                 & (hour <= 23) & (minute <= 59) & (second <= 59))
+        timestamps[:] = ((_days_from_civil(year, month, day) * 86400
+                          + hour * 3600 + minute * 60 + second - offset) * NS
+                         + _digits(digits, 20, 3) * 1000000)
+    for i in np.flatnonzero(~fast):
+        timestamps[i] = parse_timestamp(input_strs[i])
+    return timestamps
+
+
+@functools.lru_cache(maxsize=TIMESTAMP_CACHE)
+def _format_date(days):
+    return date.fromordinal(days + EPOCH_ORDINAL).isoformat()
+
+
+def format_timestamp(timestamp, utc_offset):
+    # ISO string of an epoch time in ns at a UTC offset in seconds, as
+    # datetime.isoformat() gives it, to the microsecond
+    days, microseconds = divmod(timestamp // 1000 + utc_offset * 1000000,
+                                86400 * 1000000)
+    seconds, microseconds = divmod(microseconds, 1000000)
+    output_str = (f"{_format_date(days)}T{seconds // 3600:02d}:"
+                  f"{seconds // 60 % 60:02d}:{seconds % 60:02d}")
+    if (microseconds != 0):
+        output_str += f".{microseconds:06d}"
+    offset_hour, offset_minute = divmod(abs(utc_offset) // 60, 60)
+    return (f"{output_str}{'-' if utc_offset < 0 else '+'}"
+            f"{offset_hour:02d}:{offset_minute:02d}")
+
+
 def create_json_filter(input_str):
     if (isfile(input_str)):
         with open(input_str) as input_file:
@@ -24,6 +184,33 @@ def create_json_filter(input_str):
     return json_obj
 
 
+def make_options(defaults, options=None):
+    # The options a converter reads, taken from an argparse Namespace, a
+    # dict or None, with the defaults for anything missing
+    if (options is None):
+        values = dict()
+    elif (isinstance(options, dict)):
+        values = options
+    else:
+        values = vars(options)
+    return SimpleNamespace(**{key: values.get(key, val)
+                              for key, val in defaults.items()})
+
+
+def iter_batches(iterable, size):
+    # Lists of up to size items, a list given whole if it fits
+    if (isinstance(iterable, list) and len(iterable) <= size):
+        if (len(iterable) > 0):
+            yield iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if (len(batch) == 0):
+            return
+        yield batch
+
+
 def get_operator_name(sigcap):
     op = sigcap["opName"]
     if (op == ""
@@ -81,3 +268,23 @@ def dbm_to_mw(dbm):
 
 def mw_to_dbm(mw):
     return 10 * np.log10(mw)
+
+
+def segment_stats(values, counts):
+    # Mean and standard deviation of each segment of values, the i-th
+    # segment being the next counts[i] of them, computed for all segments
+    # at once. Empty segments give NaN. Values are taken relative to the
+    # first one of their segment, so a segment of equal values has exactly
+    # its value as mean and 0 as stddev, without rounding from the sum.
+    counts = np.asarray(counts, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    segments = np.repeat(np.arange(len(counts)), counts)
+    ref = np.zeros(len(counts))
+    ref[counts > 0] = values[(np.cumsum(counts) - counts)[counts > 0]]
+    shifted = values - ref[segments]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shift_mean = np.bincount(segments, shifted, len(counts)) / counts
+        dev = shifted - shift_mean[segments]
+        std = np.sqrt(np.bincount(segments, dev * dev, len(counts))
+                      / counts)
+    return ref + shift_mean, std
@@ -0,0 +1,633 @@
+from lib import cell_helper
+from lib import filter_json
+from lib import profiler
+from lib import util
+from lib import wifi_helper
+import logging
+import numpy as np
+
+# Options that change the output rows, with their defaults
+OPTIONS = {
+    "max_lte": None,
+    "max_nr": None,
+    "max_wifi": None,
+    "filter": None,
+    "region": "NAR",
+    "include_invalid_op": False,
+    "print_sensor_data": False,
+}
+# Largest # of cells/APs of an entry, as kept by file_index.FileIndex
+MAX_KEYS = ["max_lte", "max_nr", "max_wifi_2.4", "max_wifi_5", "max_wifi_6"]
+# Entries filtered at a time
+BATCH_SIZE = 5000
+
+# Columns repeated for every extra LTE/NR cell and Wi-Fi AP, with the value
+# used to pad rows that have fewer cells than the widest row. Sensor data is
+# a group of at most one, present if any row has it.
+NR_OTHER_COLUMNS = [
+    ("pci", "NaN"),
+    ("arfcn", "NaN"),
+    ("band*", "N/A"),
+    ("freq_mhz*", "NaN"),
+    ("ss_rsrp_dbm", "NaN"),
+    ("ss_rsrq_db", "NaN"),
+    ("csi_rsrp_dbm", "NaN"),
+    ("csi_rsrq_db", "NaN"),
+    ("is_signalStrAPI", "N/A"),
+]
+LTE_OTHER_COLUMNS = [
+    ("pci", "NaN"),
+    ("earfcn", "NaN"),
+    ("band*", "N/A"),
+    ("freq_mhz*", "NaN"),
+    ("rsrp_dbm", "NaN"),
+    ("rsrq_db", "NaN"),
+    ("rssi_dbm", "NaN"),
+]
+WIFI_OTHER_COLUMNS = [
+    ("ssid", "N/A"),
+    ("bssid", "N/A"),
+    ("primary_freq_mhz", "NaN"),
+    ("center_freq_mhz", "NaN"),
+    ("primary_ch*", "NaN"),
+    ("ch_num*", "NaN"),
+    ("bw_mhz", "NaN"),
+    ("rssi_dbm", "NaN"),
+    ("standard", "N/A"),
+]
+SENSOR_COLUMNS = [
+    ("deviceTempC", ""),
+    ("ambientTempC", ""),
+    ("accelXMs2", ""),
+    ("accelYMs2", ""),
+    ("accelZMs2", ""),
+    ("battPresent", ""),
+    ("battStatus", ""),
+    ("battTechnology", ""),
+    ("battCapPerc", ""),
+    ("battTempC", ""),
+    ("battChargeUah", ""),
+    ("battVoltageMv", ""),
+    ("battCurrNowUa", ""),
+    ("battCurrAveUa", ""),
+    ("battEnergyNwh", ""),
+]
+OTHER_GROUPS = {
+    "sensor": SENSOR_COLUMNS,
+    "nr_other": NR_OTHER_COLUMNS,
+    "lte_other": LTE_OTHER_COLUMNS,
+    "wifi_2.4_other": WIFI_OTHER_COLUMNS,
+    "wifi_5_other": WIFI_OTHER_COLUMNS,
+    "wifi_6_other": WIFI_OTHER_COLUMNS,
+}
+
+# Keys of the compact rows built by _iter_rows, in column order. The keys in
+# OTHER_GROUPS hold the extra cells/APs of the row as a list of tuples.
+ROW_KEYS = [
+    "sigcap_version",
+    "android_version",
+    "is_debug",
+    "uuid",
+    "device_name",
+    "timestamp",
+    "latitude",
+    "longitude",
+    "altitude",
+    "hor_acc",
+    "ver_acc",
+    "operator",
+    "network_type*",
+    "override_network_type",
+    "radio_type",
+    "nrStatus",
+    "nrAvailable",
+    "dcNrRestricted",
+    "enDcAvailable",
+    "nrFrequencyRange",
+    "cellBandwidths",
+    "usingCA",
+    "sensor",
+    "iperf_tput_mean_mbps",
+    "iperf_tput_stddev_mbps",
+    "iperf_target",
+    "iperf_direction",
+    "iperf_protocol",
+    "ping_rtt_mean_ms",
+    "ping_rtt_stddev_ms",
+    "ping_target",
+    "http_tput_mean_mbps",
+    "http_target",
+    "lte_count",
+    "lte_primary_pci",
+    "lte_primary_ci",
+    "lte_primary_earfcn",
+    "lte_primary_band*",
+    "lte_primary_freq_mhz*",
+    "lte_primary_width_mhz",
+    "lte_primary_rsrp_dbm",
+    "lte_primary_rsrq_db",
+    "lte_primary_cqi",
+    "lte_primary_rssi_dbm",
+    "lte_primary_rssnr_db",
+    "lte_primary_timing",
+    "nr_count",
+    "nr_first_is_primary",
+    "nr_first_is_signalStrAPI",
+    "nr_first_pci",
+    "nr_first_nci",
+    "nr_first_arfcn",
+    "nr_first_band*",
+    "nr_first_freq_mhz*",
+    "nr_first_ss_rsrp_dbm",
+    "nr_first_ss_rsrq_db",
+    "nr_first_ss_sinr_db",
+    "nr_first_csi_rsrp_dbm",
+    "nr_first_csi_rsrq_db",
+    "nr_first_csi_sinr_db",
+    "nr_other",
+    "lte_other",
+    "wifi_connected_ssid",
+    "wifi_connected_bssid",
+    "wifi_connected_primary_freq_mhz",
+    "wifi_connected_center_freq_mhz",
+    "wifi_connected_primary_ch*",
+    "wifi_connected_ch_num*",
+    "wifi_connected_bw_mhz",
+    "wifi_connected_rssi_dbm",
+    "wifi_connected_standard",
+    "wifi_connected_tx_link_speed_mbps",
+    "wifi_connected_rx_link_speed_mbps",
+    "wifi_connected_max_tx_link_speed_mbps",
+    "wifi_connected_max_rx_link_speed_mbps",
+    "wifi_connected_sta_count",
+    "wifi_connected_ch_util",
+    "wifi_connected_tx_power_dbm",
+    "wifi_connected_link_margin_db",
+    "wifi_2.4_other_count",
+    "wifi_2.4_other_mean_rssi_dbm",
+    "wifi_2.4_other_stddev_rssi_db",
+    "wifi_2.4_other",
+    "wifi_5_other_count",
+    "wifi_5_other_mean_rssi_dbm",
+    "wifi_5_other_stddev_rssi_db",
+    "wifi_5_other",
+    "wifi_6_other_count",
+    "wifi_6_other_mean_rssi_dbm",
+    "wifi_6_other_stddev_rssi_db",
+    "wifi_6_other",
+]
+KEY_INDEX = {key: i for i, key in enumerate(ROW_KEYS)}
+TIMESTAMP = KEY_INDEX["timestamp"]
+# Columns of the means and stddevs set once the batch is done
+IPERF_MEAN = KEY_INDEX["iperf_tput_mean_mbps"]
+IPERF_STDDEV = KEY_INDEX["iperf_tput_stddev_mbps"]
+PING_MEAN = KEY_INDEX["ping_rtt_mean_ms"]
+PING_STDDEV = KEY_INDEX["ping_rtt_stddev_ms"]
+WIFI_RSSI_STATS = {
+    freq_code: (KEY_INDEX[f"wifi_{freq_code}_other_mean_rssi_dbm"],
+                KEY_INDEX[f"wifi_{freq_code}_other_stddev_rssi_db"])
+    for freq_code in ["2.4", "5", "6"]
+}
+# Values written for a missing LTE primary cell, NR first cell and
+# connected Wi-Fi AP
+EMPTY_LTE_PRIMARY = ("NaN", "NaN", "NaN", "N/A", "NaN", "NaN", "NaN", "NaN",
+                     "NaN", "NaN", "NaN", "NaN")
+EMPTY_NR_FIRST = ("N/A", "N/A", "NaN", "NaN", "NaN", "N/A", "NaN", "NaN",
+                  "NaN", "NaN", "NaN", "NaN", "NaN")
+EMPTY_WIFI_CONNECTED = ("N/A", "N/A", "NaN", "NaN", "NaN", "NaN", "NaN", "NaN",
+                        "N/A", "NaN", "NaN", "NaN", "NaN", "NaN", "NaN", "NaN",
+                        "NaN")
+
+
+def get_band(freq):
+    # Band of the Wi-Fi other columns an AP goes to by its primary
+    # frequency. Unlike wifi_helper.get_freq_code, any frequency has one, so
+    # the APs counted for the widths are the ones written.
+    if (freq < 5000):
+        return "2.4"
+    if (freq < 5925):
+        return "5"
+    return "6"
+
+
+def wifi_other_values(cell):
+    primary_ch = wifi_helper.get_channel_from_freq(cell["primaryFreq"], 20)
+    return (
+        cell["ssid"] if "ssid" in cell else "",
+        cell["bssid"],
+        cell["primaryFreq"],
+        (cell["centerFreq1"] if cell["centerFreq1"] != 0
+         else cell["centerFreq0"] if cell["centerFreq0"] != 0
+         else cell["primaryFreq"]),
+        primary_ch,
+        (wifi_helper.get_channel_from_freq(cell["primaryFreq"], cell["width"])
+         if cell["width"] > 0
+         else primary_ch),
+        cell["width"] if cell["width"] > 0 else "NaN",
+        util.clean_signal(cell["rssi"]),
+        cell["standard"],
+    )
+
+
+def _add_values(batch_values, values):
+    batch_values[0].extend(values)
+    batch_values[1].append(len(values))
+
+
+def _set_stats(rows, batch_values, mean_index, std_index):
+    values, counts = batch_values
+    means, stds = util.segment_stats(values, counts)
+    for row, count, mean, std in zip(rows, counts, means, stds):
+        if (count > 0):
+            row[mean_index] = mean
+            row[std_index] = std
+
+
+def _set_rssi_stats(rows, batch_values, mean_index, std_index):
+    # RSSI is averaged as linear power, a zero stddev is left as NaN
+    values, counts = batch_values
+    means_mw, stds_mw = util.segment_stats(
+        util.dbm_to_mw(np.array(values, dtype=np.float64)), counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = util.mw_to_dbm(means_mw)
+        stds = util.mw_to_dbm(stds_mw)
+    for row, count, mean, std_mw, std in zip(rows, counts, means, stds_mw,
+                                             stds):
+        if (count > 0):
+            row[mean_index] = mean
+            if (std_mw != 0):
+                row[std_index] = std
+
+
+def _lte_primary_values(cell):
+    earfcn = util.clean_signal(cell["earfcn"])
+    return (
+        util.clean_signal(cell["pci"]),
+        util.clean_signal(cell["ci"]),
+        earfcn,
+        cell_helper.earfcn_to_band(earfcn),
+        cell_helper.earfcn_to_freq(earfcn),
+        util.clean_signal(cell["width"] / 1000),
+        util.clean_signal(cell["rsrp"]),
+        util.clean_signal(cell["rsrq"]),
+        util.clean_signal(cell["cqi"]),
+        util.clean_signal(cell["rssi"]),
+        util.clean_signal(cell["rssnr"]),
+        util.clean_signal(cell["timing"]),
+    )
+
+
+def _nr_first_values(cell, region):
+    arfcn = util.clean_signal(cell["nrarfcn"])
+    return (
+        cell["status"] == "primary",
+        cell["isSignalStrAPI"],
+        util.clean_signal(cell["nrPci"]),
+        util.clean_signal(cell["nci"]),
+        arfcn,
+        cell_helper.nrarfcn_to_band(arfcn, reg=region),
+        cell_helper.nrarfcn_to_freq(arfcn),
+        util.clean_signal(cell["ssRsrp"]),
+        util.clean_signal(cell["ssRsrq"]),
+        util.clean_signal(cell["ssSinr"]),
+        util.clean_signal(cell["csiRsrp"]),
+        util.clean_signal(cell["csiRsrq"]),
+        util.clean_signal(cell["csiSinr"]),
+    )
+
+
+def _wifi_connected_values(cell):
+    sta_count = util.clean_signal(cell["staCount"])
+    ch_util = util.clean_signal(cell["chUtil"])
+    return wifi_other_values(cell) + (
+        cell["txLinkSpeed"],
+        cell["rxLinkSpeed"],
+        cell["maxSupportedTxLinkSpeed"],
+        cell["maxSupportedRxLinkSpeed"],
+        "NaN" if sta_count == -1 else sta_count,
+        "NaN" if ch_util == -1 else ch_util,
+        util.clean_signal(cell["txPower"]),
+        util.clean_signal(cell["linkMargin"]),
+    )
+
+
+def _iter_rows(converter, sigcap):
+    options = converter.options
+    region = cell_helper.REGION[options.region]
+
+    # Extra cells beyond the --max-* options are never written, so there
+    # is no need to keep them
+    limit_nr = (None if options.max_nr is None
+                else max(options.max_nr - 1, 0))
+    limit_lte = (None if options.max_lte is None
+                 else max(options.max_lte - 1, 0))
+    limit_wifi = (None if options.max_wifi is None
+                  else max(options.max_wifi, 0))
+
+    # Rows of the batch, and the values averaged per row, gathered with the
+    # number each row has so the means and stddevs are computed in one go
+    rows = list()
+    batch_values = {key: (list(), list())
+                    for key in ["iperf", "ping", "2.4", "5", "6"]}
+    for entry in sigcap:
+        if (not converter.max_from_index):
+            converter.update_max_counts(entry)
+        if (
+            not options.include_invalid_op
+            and "opName" not in entry
+            and "simName" not in entry
+            and "carrierName" not in entry
+        ):
+            continue
+
+        operator = util.get_operator_name(entry)
+        if (not options.include_invalid_op and operator == "Unknown"):
+            continue
+        row = [
+            entry["version"],
+            entry["androidVersion"],
+            entry["isDebug"],
+            entry["uuid"],
+            entry["deviceName"],
+            entry["datetimeIso"],
+            entry["location"]["latitude"],
+            entry["location"]["longitude"],
+            entry["location"]["altitude"],
+            entry["location"]["hor_acc"],
+            entry["location"]["ver_acc"],
+            operator,
+            util.get_network_type(entry),
+            entry["overrideNetworkType"],
+            entry["phoneType"],
+            entry["nrStatus"],
+            entry["nrAvailable"],
+            entry["dcNrRestricted"],
+            entry["enDcAvailable"],
+            entry["nrFrequencyRange"],
+            entry["cellBandwidths"],
+            entry["usingCA"],
+        ]
+
+        # Sensor
+        if ("sensor" in entry and options.print_sensor_data):
+            row.append([tuple(
+                entry["sensor"][name] for name, _ in SENSOR_COLUMNS)])
+            converter.has_sensor = True
+        else:
+            row.append(list())
+
+        # iperf, the mean and stddev are set once the batch is done
+        if "iperf_info" in entry and len(entry["iperf_info"]) > 0:
+            _add_values(batch_values["iperf"],
+                        [val["tputMbps"] for val in entry["iperf_info"]])
+            row += ("NaN", "NaN") + tuple(
+                next((val[key] for val in entry["iperf_info"]
+                      if key in val and val[key]),
+                     "N/A")
+                for key in ["target", "direction", "protocol"])
+        else:
+            _add_values(batch_values["iperf"], list())
+            row += ("NaN", "NaN", "N/A", "N/A", "N/A")
+
+        # ping, the mean and stddev are set once the batch is done
+        if "ping_info" in entry and len(entry["ping_info"]) > 0:
+            _add_values(batch_values["ping"],
+                        [val["time"] for val in entry["ping_info"]])
+            row += ("NaN", "NaN", next(
+                (val["target"] for val in entry["ping_info"]
+                 if "target" in val and val["target"]),
+                "N/A"))
+        else:
+            _add_values(batch_values["ping"], list())
+            row += ("NaN", "NaN", "N/A")
+
+        # HTTP
+        if "http_info" in entry:
+            http_info = entry["http_info"]
+            row += (
+                (http_info["bytesDownloaded"] * 8e3
+                 / http_info["durationNano"])
+                if http_info["durationNano"] > 0
+                else "NaN",
+                http_info["targetUrl"]
+                if "targetUrl" in http_info and http_info["targetUrl"]
+                else "N/A",
+            )
+        else:
+            row += ("NaN", "N/A")
+
+        # The primary cells are left out of the other cells, without
+        # changing the entry
+        cell_info = entry["cell_info"]
+        nr_info = entry["nr_info"]
+        row.append(len(cell_info))
+
+        # LTE primary
+        lte_primary = next(
+            (x for x in cell_info if util.is_primary(x)), None)
+        if lte_primary:
+            row += _lte_primary_values(lte_primary)
+
+            # Remove LTE primary
+            cell_info = [val for val in cell_info if val != lte_primary]
+        else:
+            row += EMPTY_LTE_PRIMARY
+
+        row.append(len(nr_info))
+
+        # NR primary
+        nr_primary = next(
+            (x for x in nr_info if util.is_primary(x)), None)
+        if nr_primary is None and len(nr_info) > 0:
+            nr_primary = nr_info[0]
+        if nr_primary:
+            row += _nr_first_values(nr_primary, region)
+
+            # Remove NR primary
+            nr_info = [val for val in nr_info if val != nr_primary]
+        else:
+            row += EMPTY_NR_FIRST
+
+        # NR cells
+        nr_cells = sorted(nr_info, key=lambda x: x["ssRsrp"])
+        nr_other = list()
+        for cell in nr_cells[:limit_nr]:
+            arfcn = util.clean_signal(cell["nrarfcn"])
+            nr_other.append((
+                util.clean_signal(cell["nrPci"]),
+                arfcn,
+                cell_helper.nrarfcn_to_band(arfcn, reg=region),
+                cell_helper.nrarfcn_to_freq(arfcn),
+                util.clean_signal(cell["ssRsrp"]),
+                util.clean_signal(cell["ssRsrq"]),
+                util.clean_signal(cell["csiRsrp"]),
+                util.clean_signal(cell["csiRsrq"]),
+                cell["isSignalStrAPI"],
+            ))
+        row.append(nr_other)
+
+        # LTE cells
+        lte_cells = sorted(cell_info, key=lambda x: x["rsrp"])
+        lte_other = list()
+        for cell in lte_cells[:limit_lte]:
+            earfcn = util.clean_signal(cell["earfcn"])
+            lte_other.append((
+                util.clean_signal(cell["pci"]),
+                earfcn,
+                cell_helper.earfcn_to_band(earfcn),
+                cell_helper.earfcn_to_freq(earfcn),
+                util.clean_signal(cell["rsrp"]),
+                util.clean_signal(cell["rsrq"]),
+                util.clean_signal(cell["rssi"]),
+            ))
+        row.append(lte_other)
+
+        # Connected Wi-Fi
+        wifi_conn = next(
+            (val for val in entry["wifi_info"] if val["connected"]), None)
+        if wifi_conn:
+            row += _wifi_connected_values(wifi_conn)
+        else:
+            row += EMPTY_WIFI_CONNECTED
+
+        # Wi-Fi other 2.4 GHz, 5 GHz and 6 GHz, the mean and stddev of the
+        # RSSI are set once the batch is done
+        wifi_other = {"2.4": list(), "5": list(), "6": list()}
+        for val in entry["wifi_info"]:
+            if not val["connected"]:
+                wifi_other[get_band(val["primaryFreq"])].append(val)
+        for freq_code, aps in wifi_other.items():
+            _add_values(batch_values[freq_code], [val["rssi"] for val in aps])
+            row += (len(aps), "NaN", "NaN",
+                    [wifi_other_values(cell) for cell in aps[:limit_wifi]])
+
+        logging.debug(row)
+        rows.append(row)
+
+    _set_stats(rows, batch_values["iperf"], IPERF_MEAN, IPERF_STDDEV)
+    _set_stats(rows, batch_values["ping"], PING_MEAN, PING_STDDEV)
+    for freq_code, (mean_index, std_index) in WIFI_RSSI_STATS.items():
+        _set_rssi_stats(rows, batch_values[freq_code], mean_index,
+                        std_index)
+    for row in rows:
+        yield tuple(row)
+
+
+# Conversion of SigCap entries into the rows of the wide CSV, one per entry.
+# The number of extra cell/AP columns is the largest seen over all entries,
+# so rows are first built compact, with the extra cells/APs of each group
+# as a list of tuples, and spread into columns by expand_row with the
+# limits known once every entry was converted. Unless max_counts (e.g. from
+# an index) gives the largest counts, they are updated while converting.
+class WideConverter:
+    def __init__(self, options=None, max_counts=None):
+        self.options = util.make_options(OPTIONS, options)
+        self.max_from_index = max_counts is not None
+        self.max_counts = {key: -1 for key in MAX_KEYS}
+        if (max_counts is not None):
+            self.max_counts.update(
+                {key: max_counts[key] for key in MAX_KEYS})
+        self.has_sensor = False
+
+    def update_max_counts(self, entry):
+        max_counts = self.max_counts
+        max_counts["max_lte"] = max(max_counts["max_lte"],
+                                    len(entry["cell_info"]))
+        max_counts["max_nr"] = max(max_counts["max_nr"],
+                                   len(entry["nr_info"]))
+
+        # Get max Wi-Fi APs
+        counts = {"2.4": 0, "5": 0, "6": 0}
+        for wifi_entry in entry["wifi_info"]:
+            if not wifi_entry["connected"]:
+                counts[get_band(wifi_entry["primaryFreq"])] += 1
+        for freq_code, count in counts.items():
+            key = f"max_wifi_{freq_code}"
+            max_counts[key] = max(max_counts[key], count)
+
+    def convert(self, records):
+        # Compact rows for an iterable of SigCap entries, given as the
+        # entries are consumed
+        for sigcap in util.iter_batches(records, BATCH_SIZE):
+            # If filter exist, filter the sigcap object
+            if (self.options.filter is not None):
+                with profiler.stage("filter"):
+                    sigcap = filter_json.filter_batch(self.options.filter,
+                                                      sigcap)
+                logging.info(f"After filter, # of data: {len(sigcap)}")
+            yield from _iter_rows(self, sigcap)
+
+    def get_limits(self):
+        # Number of extra cells/APs written per row: the largest count
+        # seen, capped by the max_* options. The primary LTE/NR cell has
+        # its own columns, hence one less for those.
+        options = self.options
+        max_counts = self.max_counts
+        limits = {
+            "sensor": 1 if self.has_sensor else 0,
+            "nr_other": max_counts["max_nr"] - 1,
+            "lte_other": max_counts["max_lte"] - 1,
+            "wifi_2.4_other": max_counts["max_wifi_2.4"],
+            "wifi_5_other": max_counts["max_wifi_5"],
+            "wifi_6_other": max_counts["max_wifi_6"],
+        }
+        if (options.max_nr is not None
+                and options.max_nr < max_counts["max_nr"]):
+            logging.info(f"Using the specified max # of NR cells: "
+                         f"{options.max_nr}")
+            limits["nr_other"] = options.max_nr - 1
+        if (options.max_lte is not None
+                and options.max_lte < max_counts["max_lte"]):
+            logging.info(f"Using the specified max # of LTE cells: "
+                         f"{options.max_lte}")
+            limits["lte_other"] = options.max_lte - 1
+        for band in ["2.4", "5", "6"]:
+            if (options.max_wifi is not None
+                    and options.max_wifi < max_counts[f"max_wifi_{band}"]):
+                logging.info(f"Using the specified max # of Wi-Fi {band} "
+                             f"GHz: {options.max_wifi}")
+                limits[f"wifi_{band}_other"] = options.max_wifi
+        return {key: max(val, 0) for key, val in limits.items()}
+
+    def get_columns(self, limits):
+        # Name and padding value of each output column
+        columns = list()
+        for key in ROW_KEYS:
+            if key not in OTHER_GROUPS:
+                columns.append((key, ""))
+            elif key == "sensor":
+                if (limits[key] > 0):
+                    columns += [(f"sensor.{name}", fill)
+                                for name, fill in SENSOR_COLUMNS]
+            else:
+                for i in range(limits[key]):
+                    columns += [(f"{key}{i + 1}_{suffix}", fill)
+                                for suffix, fill in OTHER_GROUPS[key]]
+        return columns
+
+    def get_header(self, limits):
+        return [name for name, _ in self.get_columns(limits)]
+
+    def expand_row(self, row, limits):
+        # Spread the extra cells/APs kept as lists of tuples into their own
+        # columns, padded up to the limit of each group
+        out = list()
+        for key, val in zip(ROW_KEYS, row):
+            if key not in OTHER_GROUPS:
+                out.append(val)
+                continue
+            limit = limits[key]
+            for values in val[:limit]:
+                out += values
+            for _ in range(limit - len(val)):
+                out += [fill for _, fill in OTHER_GROUPS[key]]
+        return out
+
+
+def convert_wide(records, options=None, converter=None):
+    # Compact rows for an iterable of SigCap entries, given as the entries
+    # are consumed. Pass a WideConverter to get the header and expand the
+    # rows once all of them were taken.
+    if (converter is None):
+        converter = WideConverter(options)
+    yield from converter.convert(records)
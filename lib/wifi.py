@@ -0,0 +1,145 @@
+from lib import dedup
+from lib import filter_json
+from lib import profiler
+from lib import util
+from lib import wifi_helper
+import logging
+
+# Output columns, each row is the overview of its entry followed by one AP
+OVERVIEW_COLUMNS = [
+    "sigcap_version",
+    "android_version",
+    "is_debug",
+    "uuid",
+    "device_name",
+    "latitude",
+    "longitude",
+    "altitude",
+    "hor_acc",
+    "ver_acc",
+]
+AP_COLUMNS = [
+    "timestamp",
+    "ssid",
+    "bssid",
+    "primary_freq_mhz",
+    "center_freq_mhz",
+    "width_mhz",
+    "channel_num",
+    "primary_ch_num",
+    "rssi_dbm",
+    "standard",
+    "connected",
+    "link_speed",
+    "tx_link_speed",
+    "rx_link_speed",
+    "max_supported_tx_link_speed",
+    "max_supported_rx_link_speed",
+    "capabilities",
+    "sta_count",
+    "ch_util",
+    "tx_power_dbm",
+    "link_margin_db",
+    "aruba_ap_name",
+]
+COLUMNS = OVERVIEW_COLUMNS + AP_COLUMNS
+TIMESTAMP = COLUMNS.index("timestamp")
+UUID = COLUMNS.index("uuid")
+# Options that change the output rows, with their defaults
+OPTIONS = {
+    "filter": None,
+    "skip_2.4ghz": False,
+    "skip_5ghz": False,
+    "skip_6ghz": False,
+    "dedup_window": None,
+}
+# Entries filtered at a time
+BATCH_SIZE = 5000
+
+
+def create_dedup(dedup_window=None):
+    # Dedup of AP timestamps, in epoch ns, with the window in seconds
+    return dedup.TimestampDedup(
+        None if dedup_window is None else dedup_window * util.NS)
+
+
+def _iter_rows(sigcap, options, device_timedata):
+    timestamps = util.parse_timestamps(
+        [entry["datetimeIso"] for entry in sigcap])
+    for entry, timestamp in zip(sigcap, timestamps.tolist()):
+        overview = (
+            entry["version"],
+            entry["androidVersion"],
+            entry["isDebug"],
+            entry["uuid"],
+            entry["deviceName"],
+            entry["location"]["latitude"],
+            entry["location"]["longitude"],
+            entry["location"]["altitude"],
+            entry["location"]["hor_acc"],
+            entry["location"]["ver_acc"],
+        )
+        utc_offset = util.parse_utc_offset(entry["datetimeIso"])
+
+        for wifi_entry in entry["wifi_info"]:
+            freq_code = wifi_helper.get_freq_code(wifi_entry["primaryFreq"])
+            if ((getattr(options, "skip_2.4ghz") and freq_code == "2.4")
+                    or (options.skip_5ghz and freq_code == "5")
+                    or (options.skip_6ghz and freq_code == "6")):
+                continue
+
+            # Scan time to the microsecond, like a timedelta
+            actual_timestamp = timestamp - round(
+                wifi_entry["timestampDeltaMs"] * 1000) * 1000
+            if device_timedata.is_duplicate(entry["uuid"], actual_timestamp):
+                continue
+
+            sta_count = util.clean_signal(wifi_entry["staCount"])
+            ch_util = util.clean_signal(wifi_entry["chUtil"])
+            yield overview + (
+                util.format_timestamp(actual_timestamp, utc_offset),
+                wifi_entry["ssid"] if "ssid" in wifi_entry else "",
+                wifi_entry["bssid"],
+                wifi_entry["primaryFreq"],
+                (wifi_entry["centerFreq0"] if wifi_entry["centerFreq1"] == 0
+                 else wifi_entry["centerFreq1"]),
+                wifi_entry["width"],
+                wifi_helper.get_channel_from_freq(
+                    wifi_entry["primaryFreq"], wifi_entry["width"]),
+                wifi_helper.get_channel_from_freq(
+                    wifi_entry["primaryFreq"], 20),
+                util.clean_signal(wifi_entry["rssi"]),
+                wifi_entry["standard"],
+                wifi_entry["connected"],
+                util.clean_signal(wifi_entry["linkSpeed"]),
+                util.clean_signal(wifi_entry["txLinkSpeed"]),
+                util.clean_signal(wifi_entry["rxLinkSpeed"]),
+                util.clean_signal(wifi_entry["maxSupportedTxLinkSpeed"]),
+                util.clean_signal(wifi_entry["maxSupportedRxLinkSpeed"]),
+                wifi_entry["capabilities"],
+                "NaN" if sta_count == -1 else sta_count,
+                "NaN" if ch_util == -1 else ch_util,
+                util.clean_signal(wifi_entry["txPower"]),
+                util.clean_signal(wifi_entry["linkMargin"]),
+                (wifi_entry["apName"]
+                 if ("apName" in wifi_entry and wifi_entry["apName"])
+                 else "unknown"),
+            )
+
+
+def convert_wifi(records, options=None, device_timedata=None):
+    # Rows of COLUMNS, one per AP, for an iterable of SigCap entries, given
+    # as the entries are consumed. options is an argparse Namespace, a dict
+    # or None, read for the keys of OPTIONS. APs already seen from a device
+    # at the same time are skipped, pass a TimestampDedup to share what was
+    # seen between calls.
+    options = util.make_options(OPTIONS, options)
+    if (device_timedata is None):
+        device_timedata = create_dedup(options.dedup_window)
+    for sigcap in util.iter_batches(records, BATCH_SIZE):
+        # If filter exist, filter the sigcap object
+        if (options.filter is not None):
+            with profiler.stage("filter"):
+                sigcap = filter_json.filter_batch(options.filter, sigcap)
+            logging.info(f"After filter, # of data: {len(sigcap)}")
+        yield from _iter_rows(sigcap, options, device_timedata)
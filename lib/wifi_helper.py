@@ -1,3 +1,6 @@
+import numbers
+import numpy as np
+
 cell_table_2_4 = [
     # ( Channel num, Center freq MHz, Start freq MHz, End freq MHz, Width MHz)
     (1, 2412, 2401, 2423, 22),
@@ -218,7 +221,12 @@ cell_table_6 = [
 ]
 
 
-def get_freq_code(freq):
+# Frequencies covered by the direct-indexed lookup tables below
+FREQ_MIN = 2401
+FREQ_MAX = 7125
+
+
+def _get_freq_code(freq):
     match freq:
         case num if num in range(2401, 2495):
             return "2.4"
@@ -230,16 +238,67 @@ def get_freq_code(freq):
             return "unknown"
 
 
-def get_channel_from_num(freq_code, ch_num):
-    ch = None
-    # cell_table = list()
+def _get_cell_table(freq_code):
     match freq_code:
         case "2.4":
-            cell_table = cell_table_2_4
+            return cell_table_2_4
         case "5":
-            cell_table = cell_table_5
+            return cell_table_5
         case "6":
-            cell_table = cell_table_6
+            return cell_table_6
+        case _:
+            return list()
+
+
+# Freq code of each MHz from FREQ_MIN, and per width the channel number of
+# each MHz (the first matching channel of the band's table, or None)
+def _build_channel_tables(freq_codes):
+    channel_tables = dict()
+    for i, freq_code in enumerate(freq_codes):
+        for cell in reversed(_get_cell_table(freq_code)):
+            if (cell[2] <= FREQ_MIN + i < cell[3]):
+                channel_tables.setdefault(
+                    cell[4], [None] * len(freq_codes))[i] = cell[0]
+    return channel_tables
+
+
+_freq_codes = [_get_freq_code(freq) for freq in range(FREQ_MIN, FREQ_MAX)]
+_channel_tables = _build_channel_tables(_freq_codes)
+
+_freq_code_arr = np.array(_freq_codes, dtype=object)
+_width_arr = np.array(sorted(_channel_tables), dtype=np.float64)
+_channel_arr = np.array([
+    [-1 if ch is None else ch for ch in _channel_tables[width]]
+    for width in sorted(_channel_tables)])
+
+
+def _freq_slot(freq):
+    # Index of freq in the lookup tables, or None for anything that is not
+    # a whole number of MHz in [FREQ_MIN, FREQ_MAX)
+    if (isinstance(freq, float)):
+        if (not freq.is_integer()):
+            return None
+        freq = int(freq)
+    elif (isinstance(freq, numbers.Integral)):
+        # Includes NumPy integers
+        freq = int(freq)
+    else:
+        return None
+    if (FREQ_MIN <= freq < FREQ_MAX):
+        return freq - FREQ_MIN
+    return None
+
+
+def get_freq_code(freq):
+    slot = _freq_slot(freq)
+    if (slot is None):
+        return "unknown"
+    return _freq_codes[slot]
+
+
+def get_channel_from_num(freq_code, ch_num):
+    ch = None
+    cell_table = _get_cell_table(freq_code)
 
     ch_list = next((x for x in cell_table if x[0] == ch_num), None)
     if ch_list:
@@ -248,20 +307,27 @@ def get_channel_from_num(freq_code, ch_num):
 
 
 def get_channel_from_freq(freq, width):
-    ch = None
-    cell_table = list()
-    freq_code = get_freq_code(freq)
-    match freq_code:
-        case "2.4":
-            cell_table = cell_table_2_4
-        case "5":
-            cell_table = cell_table_5
-        case "6":
-            cell_table = cell_table_6
+    slot = _freq_slot(freq)
+    channels = _channel_tables.get(width)
+    if (slot is None or channels is None):
+        return None
+    return channels[slot]
 
-    ch_list = next(
-        (x for x in cell_table if freq in range(x[2], x[3]) and x[4] == width),
-        None)
-    if ch_list:
-        ch = ch_list[0]
-    return ch
+
+def get_channel_from_freq_array(freqs, widths):
+    # Array version of get_freq_code and get_channel_from_freq, returns the
+    # freq codes and channel numbers (None if unknown) as object arrays
+    freqs = np.asarray(freqs, dtype=np.float64)
+    widths = np.asarray(widths, dtype=np.float64)
+    valid = ((np.floor(freqs) == freqs) & (freqs >= FREQ_MIN)
+             & (freqs < FREQ_MAX))
+    slots = np.where(valid, freqs - FREQ_MIN, 0).astype(np.intp)
+    freq_codes = np.where(valid, _freq_code_arr[slots], "unknown")
+
+    width_idx = np.minimum(np.searchsorted(_width_arr, widths),
+                           len(_width_arr) - 1)
+    valid &= _width_arr[width_idx] == widths
+    channels = np.where(valid, _channel_arr[width_idx, slots], -1)
+    channels = channels.astype(object)
+    channels[channels == -1] = None
+    return freq_codes.astype(object), channels
@@ -0,0 +1,191 @@
+import bz2
+from contextlib import contextmanager, nullcontext
+import csv
+import gzip
+import io
+from lib import sorter
+import logging
+import lzma
+import os
+from pathlib import Path
+import queue
+import sys
+import threading
+import zlib
+
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+READERS = {"none": open, "gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+# Size of the chunks handed to the compression thread, and how many of
+# them can wait in the queue before writing blocks
+CHUNK_SIZE = 1 << 20
+QUEUE_SIZE = 8
+
+
+# Writes rows, sequences of values in the order of fieldnames, to a CSV
+# file as they are appended. The header is written with the first row.
+# Takes the place of a RowSorter when rows do not need to be buffered.
+class RowWriter:
+    def __init__(self, output_file, fieldnames):
+        self.output_file = output_file
+        self.fieldnames = fieldnames
+        self.csv_writer = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _start(self):
+        logging.debug(f"Header list: {','.join(self.fieldnames)}")
+        self.csv_writer = csv.writer(self.output_file)
+        self.csv_writer.writerow(self.fieldnames)
+
+    def append(self, row):
+        if (self.csv_writer is None):
+            self._start()
+        self.csv_writer.writerow(row)
+        self.count += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+
+def _compressor(compression):
+    match compression:
+        case "gzip":
+            # wbits=31 adds the gzip header and trailer, level 6 is the
+            # default of the gzip command
+            return zlib.compressobj(6, zlib.DEFLATED, 31)
+        case "bz2":
+            return bz2.BZ2Compressor()
+        case "xz":
+            return lzma.LZMACompressor()
+    raise ValueError(f"Unknown compression {compression}")
+
+
+# Binary file whose writes are compressed and written out by a background
+# thread, fed through a bounded queue, so encoding rows and compressing
+# them overlap. zlib, bz2 and lzma release the GIL while compressing.
+class CompressedFile(io.RawIOBase):
+    def __init__(self, path, compression):
+        self.compressor = _compressor(compression)
+        self.file = open(path, "wb")
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if (self.error is not None):
+            raise self.error
+        self.queue.put(bytes(data))
+        return len(data)
+
+    def _run(self):
+        # After an error, keep draining the queue so writers never block
+        while True:
+            data = self.queue.get()
+            if (data is None):
+                break
+            if (self.error is not None):
+                continue
+            try:
+                self.file.write(self.compressor.compress(data))
+            except Exception as err:
+                self.error = err
+        if (self.error is None):
+            try:
+                self.file.write(self.compressor.flush())
+            except Exception as err:
+                self.error = err
+
+    def close(self):
+        if (self.closed):
+            return
+        super().close()
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        if (self.error is not None):
+            raise self.error
+
+
+def get_compression(path, compression="auto"):
+    # "auto" picks the compression from the suffix of the path
+    if (compression == "auto"):
+        return COMPRESSIONS.get(Path(path).suffix.lower(), "none")
+    return compression
+
+
+def open_output(path, compression="auto"):
+    # "-" is stdout, which is left open
+    if (str(path) == "-"):
+        return nullcontext(sys.stdout)
+    compression = get_compression(path, compression)
+    if (compression == "none"):
+        return open(path, "w")
+    logging.debug(f"Writing {path} with {compression} compression")
+    return io.TextIOWrapper(io.BufferedWriter(
+        CompressedFile(path, compression), CHUNK_SIZE))
+
+
+@contextmanager
+def replace_output(path, compression="auto"):
+    # Like open_output, but path is only replaced once the output is
+    # written completely
+    if (str(path) == "-"):
+        with open_output(path) as output_file:
+            yield output_file
+        return
+    path = Path(path)
+    compression = get_compression(path, compression)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        with open_output(tmp_path, compression) as output_file:
+            yield output_file
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+@contextmanager
+def read_output(path, compression="auto"):
+    # Header and rows, as lists of strings, of a CSV written by open_output
+    opener = READERS[get_compression(path, compression)]
+    with opener(path, "rt", newline="") as input_file:
+        reader = csv.reader(input_file)
+        yield next(reader, list()), reader
+
+
+def _reorder(header, fieldnames, fills, rows):
+    # Rows with the columns of header rearranged into fieldnames, and
+    # columns missing from header set to their fill value
+    if (header == fieldnames):
+        return rows
+    dropped = set(header) - set(fieldnames)
+    if (len(dropped) > 0):
+        raise ValueError(f"Columns {sorted(dropped)} would be dropped")
+    positions = {name: i for i, name in enumerate(header)}
+    getters = [(positions.get(name), fill)
+               for name, fill in zip(fieldnames, fills)]
+    return ([fill if i is None else row[i] for i, fill in getters]
+            for row in rows)
+
+
+def merge_output(path, fieldnames, rows, key, fills=None,
+                 compression="auto"):
+    # Merge rows sorted by key into the CSV at path, itself sorted by key,
+    # which may have fewer columns than fieldnames. Returns the row count.
+    if (fills is None):
+        fills = [""] * len(fieldnames)
+    with read_output(path, compression) as (header, old_rows), \
+            replace_output(path, compression) as output_file:
+        row_writer = RowWriter(output_file, fieldnames)
+        row_writer.extend(sorter.merge_sorted(
+            [(str(path), _reorder(header, fieldnames, fills, old_rows)),
+             ("new rows", rows)],
+            key))
+    return len(row_writer)
@@ -0,0 +1,37 @@
+import argparse
+from lib import cache
+import logging
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cache_dir", type=Path,
+                        help="cache folder given to --cache-dir")
+    parser.add_argument("action", choices=["info", "clear", "evict"],
+                        help="show cache usage, remove all entries, or "
+                             "evict entries beyond --cache-size")
+    parser.add_argument("--cache-size", type=float, default=1024,
+                        help="maximum cache size in MB, default=1024")
+    parser.add_argument("--log-level", default="warning",
+                        help="Log level, default=warning")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    file_cache = cache.FileCache(args.cache_dir, args.cache_size)
+    match args.action:
+        case "clear":
+            file_cache.clear()
+            print(f"Cleared {args.cache_dir}")
+        case "evict":
+            file_cache.evict()
+    if (args.action != "clear"):
+        info = file_cache.info()
+        print(f"Cache folder: {info['dir']}")
+        print(f"# of entries: {info['entries']}")
+        print(f"Size: {info['size_mb']:.1f} MB "
+              f"(max {info['max_size_mb']:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+from lib import file_index
+from lib import loader
+import logging
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", type=Path,
+                        help="input SigCap folder or file")
+    parser.add_argument("index_file", type=Path,
+                        help="index file to create or update")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes summarizing input files, "
+                             "default=1")
+    parser.add_argument("--log-level", default="warning",
+                        help="Log level, default=warning")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    index = file_index.FileIndex(args.index_file)
+    input_files = loader.list_files(args.input)
+    print(f"Indexing {len(input_files)} files ...")
+    num_updated = index.update(input_files, workers=args.workers)
+    index.save()
+    print(f"Summarized {num_updated} new or changed files, "
+          f"{len(input_files) - num_updated} were up to date")
+
+    counts = index.max_counts(input_files)
+    print(f"# of entries: "
+          f"{sum(index.get(file)['count'] for file in input_files)}")
+    print(f"Max number of LTE cells: {counts['max_lte']}")
+    print(f"Max number of NR cells: {counts['max_nr']}")
+    print(f"Max number of Wi-Fi 2.4 GHz: {counts['max_wifi_2.4']}")
+    print(f"Max number of Wi-Fi 5 GHz: {counts['max_wifi_5']}")
+    print(f"Max number of Wi-Fi 6 GHz: {counts['max_wifi_6']}")
+    print(f"Written to {args.index_file}")
+
+
+if __name__ == "__main__":
+    main()
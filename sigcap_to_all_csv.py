@@ -0,0 +1,207 @@
+import argparse
+from lib import cache
+from lib import cellular
+from lib import file_index
+from lib import filter_json
+from lib import loader
+from lib import profiler
+from lib import sorter
+from lib import util
+from lib import wide
+from lib import wifi
+from lib import writer
+from lib import cell_helper
+import logging
+from pathlib import Path
+
+OUTPUTS = ["wide", "cellular", "wifi"]
+# Outputs being converted, as (name, convert, RowSorter) tuples
+outputs = list()
+
+
+def cb_process(obj):
+    print(f"Processing... # of data: {len(obj['json'])}")
+    if len(obj["files"]) < 10:
+        print(f"Files: {','.join(obj['files'])}")
+    logging.info(obj["options"])
+
+    # Filter once for all outputs, the converters only read the entries
+    sigcap = obj["json"]
+    if (obj["options"].filter is not None):
+        with profiler.stage("filter"):
+            sigcap = filter_json.filter_batch(obj["options"].filter, sigcap)
+        logging.info(f"After filter, # of data: {len(sigcap)}")
+    for name, convert, row_sorter in outputs:
+        with profiler.stage(f"convert_{name}"):
+            row_sorter.extend(convert(sigcap))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Decode SigCap files once and convert them into any of "
+                    "the wide, cellular and Wi-Fi CSVs")
+    parser.add_argument("input", type=Path,
+                        help="input SigCap folder or file")
+    parser.add_argument("--wide", type=Path,
+                        help="output CSV file of sigcap_to_csv.py")
+    parser.add_argument("--cellular", type=Path,
+                        help="output CSV file of sigcap_to_cellular_csv.py")
+    parser.add_argument("--wifi", type=Path,
+                        help="output CSV file of sigcap_to_wifi_csv.py")
+    parser.add_argument("--compression",
+                        choices=["auto", "none", "gzip", "bz2", "xz"],
+                        default="auto",
+                        help="compress the output CSVs in a background "
+                             "thread, auto picks it from the .gz, .bz2 or "
+                             ".xz suffix of each output, default=auto")
+    parser.add_argument("--max-lte", type=int,
+                        help="maximum number of LTE cells to be displayed")
+    parser.add_argument("--max-nr", type=int,
+                        help="maximum number of NR cells to be displayed")
+    parser.add_argument("--max-wifi", type=int,
+                        help="maximum number of Wi-Fi APs to be displayed")
+    parser.add_argument("--filter", type=str,
+                        help="filter of JSON string or path to JSON file")
+    parser.add_argument("--region", choices=cell_helper.REGION.keys(),
+                        default="NAR",
+                        help="Region for NR band conversion, default=NAR")
+    parser.add_argument("--include-invalid-op", action="store_true",
+                        help="include invalid operator names")
+    parser.add_argument("--print-sensor-data", action="store_true",
+                        help="print out sensor data")
+    parser.add_argument("--skip-2.4ghz", action="store_true",
+                        help="Skip 2.4 GHz Wi-Fi APs")
+    parser.add_argument("--skip-5ghz", action="store_true",
+                        help="Skip 5 GHz Wi-Fi APs")
+    parser.add_argument("--skip-6ghz", action="store_true",
+                        help="Skip 6 GHz Wi-Fi APs")
+    parser.add_argument("--dedup-window", type=float,
+                        help="forget timestamps older than this many "
+                             "seconds before the latest one of a device when "
+                             "skipping duplicates, needs time-ordered input")
+    parser.add_argument("--memory-budget", type=float,
+                        help="approximate memory in MB for buffered output "
+                             "rows, shared by the outputs, spill sorted runs "
+                             "to temporary files beyond it")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes decoding input files, "
+                             "default=1")
+    parser.add_argument("--json-backend", choices=loader.JSON_BACKENDS,
+                        default="stdlib",
+                        help="JSON decoder, stdlib streams the entries of "
+                             "each file, orjson and ujson are faster but "
+                             "read each file whole, so memory grows with the "
+                             "largest file, auto uses orjson or ujson if "
+                             "installed, default=stdlib")
+    parser.add_argument("--index", type=Path,
+                        help="index from sigcap_index.py, used to skip "
+                             "files that cannot match --filter")
+    parser.add_argument("--cache-dir", type=Path,
+                        help="cache decoded input files in this folder")
+    parser.add_argument("--cache-size", type=float, default=1024,
+                        help="maximum cache size in MB, default=1024")
+    parser.add_argument("--profile", type=Path,
+                        help="write stage and helper timings to this JSON "
+                             "file, and collapsed stacks next to it with a "
+                             ".folded suffix")
+    parser.add_argument("--log-level", default="warning",
+                        help="Log level, default=warning")
+    args = parser.parse_args()
+    names = [name for name in OUTPUTS if getattr(args, name) is not None]
+    if (len(names) == 0):
+        parser.error("give at least one of --wide, --cellular or --wifi")
+    logging.basicConfig(level=args.log_level.upper())
+    if (args.profile is not None):
+        profiler.start()
+
+    if (args.filter is not None):
+        args.filter = util.create_json_filter(args.filter)
+        print(f"Using filter: {args.filter}")
+
+    args.json_backend = loader.resolve_backend(args.json_backend)
+    file_cache = (None if args.cache_dir is None
+                  else cache.FileCache(args.cache_dir, args.cache_size))
+    index = (None if args.index is None
+             else file_index.FileIndex(args.index))
+
+    global outputs
+    outputs = list()
+
+    # The entries reach the converters already filtered
+    options = dict(vars(args), filter=None)
+    memory_budget = (None if args.memory_budget is None
+                     else args.memory_budget / len(names))
+    converter = None
+    for name in names:
+        match name:
+            case "wide":
+                # Without a filter, the max counts over the whole input are
+                # already in an up-to-date index
+                counts = None
+                if (index is not None and args.filter is None):
+                    counts = index.max_counts(loader.list_files(args.input))
+                    if (counts is not None):
+                        print("Using max counts from the index")
+                converter = wide.WideConverter(options, counts)
+                convert = converter.convert
+                key = util.timestamp_key(wide.TIMESTAMP)
+            case "cellular":
+                convert = (lambda records:
+                           cellular.convert_cellular(records, options))
+                key = util.timestamp_key(cellular.TIMESTAMP)
+            case "wifi":
+                device_timedata = wifi.create_dedup(args.dedup_window)
+                convert = (lambda records: wifi.convert_wifi(
+                    records, options, device_timedata))
+                key = util.timestamp_key(wifi.TIMESTAMP)
+        outputs.append((name, convert, sorter.RowSorter(
+            key=key, memory_budget=memory_budget)))
+
+    print("===== Start processing! =====")
+    loader.load_json(args.input, profiler.timed("convert", cb_process),
+                     options=args, workers=args.workers, cache=file_cache,
+                     index=index, filter_obj=args.filter,
+                     backend=args.json_backend)
+
+    print("Processing finished!")
+    if (converter is not None):
+        counts = converter.max_counts
+        print(f"Max number of LTE cells: {counts['max_lte']}")
+        print(f"Max number of NR cells: {counts['max_nr']}")
+        print(f"Max number of Wi-Fi 2.4 GHz: {counts['max_wifi_2.4']}")
+        print(f"Max number of Wi-Fi 5 GHz: {counts['max_wifi_5']}")
+        print(f"Max number of Wi-Fi 6 GHz: {counts['max_wifi_6']}")
+
+    for name, _, output_list in outputs:
+        output_path = getattr(args, name)
+        logging.info(f"Len {name} output_list {len(output_list)}")
+        if (len(output_list) == 0):
+            print(f"Empty {name} data! Nothing to write to {output_path}.")
+            continue
+
+        print(f"Writing to {output_path} ...")
+        # Rows are sorted (and expanded) as they are written, timed as
+        # sort (and expand) within the write stage
+        rows = profiler.timed_iter("sort", output_list.sorted())
+        match name:
+            case "wide":
+                limits = converter.get_limits()
+                header = converter.get_header(limits)
+                rows = profiler.timed_iter(
+                    "expand",
+                    (converter.expand_row(row, limits) for row in rows))
+            case "cellular":
+                header = cellular.COLUMNS
+            case "wifi":
+                header = wifi.COLUMNS
+        with profiler.stage("write"):
+            with writer.open_output(output_path,
+                                    args.compression) as output_file:
+                writer.RowWriter(output_file, header).extend(rows)
+
+    print(f"DONE!")
+    profiler.stop(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,161 +1,58 @@
 import argparse
-import csv
+from contextlib import ExitStack
+from lib import cache
+from lib import cellular
+from lib import file_index
 from lib import loader
-from lib import filter_json
+from lib import manifest
+from lib import profiler
+from lib import sorter
 from lib import util
+from lib import writer
 from lib import cell_helper
 import logging
 from pathlib import Path
+import sys
 
+COLUMNS = cellular.COLUMNS
+TIMESTAMP = cellular.TIMESTAMP
 output_list = list()
 
 
-def cb_process(obj):
+def cb_process(obj, out=None):
     print(f"Processing... # of data: {len(obj['json'])}")
     if len(obj["files"]) < 10:
         print(f"Files: {','.join(obj['files'])}")
+    logging.info(obj["options"])
+
+    if (out is None):
+        out = output_list
+    out.extend(cellular.convert_cellular(obj["json"], obj["options"]))
 
-    sigcap = obj['json']
-    options = obj['options']
-    logging.info(options)
-    global output_list
 
-    # If filter exist, filter the sigcap object
-    if (options.filter is not None):
-        sigcap = filter_json.filter_array(options.filter, sigcap)
-        print(f"After filter, # of data: {len(sigcap)}")
-
-    for entry in sigcap:
-        if (
-            not options.include_invalid_op
-            and "opName" not in entry
-            and "simName" not in entry
-            and "carrierName" not in entry
-        ):
-            continue
-
-        operator = util.get_operator_name(entry)
-        if (not options.include_invalid_op and operator == "Unknown"):
-            continue
-        overview_dict = {
-            "sigcap_version": entry["version"],
-            "android_version": entry["androidVersion"],
-            "is_debug": entry["isDebug"],
-            "uuid": entry["uuid"],
-            "device_name": entry["deviceName"],
-            "timestamp": entry["datetimeIso"],
-            "latitude": entry["location"]["latitude"],
-            "longitude": entry["location"]["longitude"],
-            "altitude": entry["location"]["altitude"],
-            "hor_acc": entry["location"]["hor_acc"],
-            "ver_acc": entry["location"]["ver_acc"],
-            "operator": operator,
-            "network_type*": util.get_network_type(entry),
-            "override_network_type": entry["overrideNetworkType"],
-            "radio_type": entry["phoneType"],
-            "nrStatus": entry["nrStatus"],
-            "nrAvailable": entry["nrAvailable"],
-            "dcNrRestricted": entry["dcNrRestricted"],
-            "enDcAvailable": entry["enDcAvailable"],
-            "nrFrequencyRange": entry["nrFrequencyRange"],
-            "cellBandwidths": entry["cellBandwidths"],
-            "usingCA": entry["usingCA"],
-        }
-
-        # Flag to insert a nan rows if there is no cellular data
-        has_data = False
-
-        # LTE primary
-        lte_primary = next(
-            (x for x in entry["cell_info"] if util.is_primary(x)), None)
-        if lte_primary:
-            temp_out = overview_dict.copy()
-            temp_out["lte/nr"] = "lte"
-            temp_out["pci"] = util.clean_signal(lte_primary["pci"])
-            temp_out["lte-ci/nr-nci"] = util.clean_signal(lte_primary["ci"])
-            temp_out["lte-earfcn/nr-arfcn"] = util.clean_signal(
-                lte_primary["earfcn"])
-            temp_out["band*"] = cell_helper.earfcn_to_band(
-                temp_out["lte-earfcn/nr-arfcn"])
-            temp_out["freq_mhz*"] = cell_helper.earfcn_to_freq(
-                temp_out["lte-earfcn/nr-arfcn"])
-            temp_out["width_mhz"] = util.clean_signal(lte_primary["width"])
-            temp_out["rsrp_dbm"] = util.clean_signal(lte_primary["rsrp"])
-            temp_out["rsrq_db"] = util.clean_signal(lte_primary["rsrq"])
-            temp_out["lte-rssi/nr-sinr_dbm"] = util.clean_signal(
-                lte_primary["rssi"])
-            temp_out["primary/other*"] = "primary"
-            output_list.append(temp_out)
-            has_data = True
-
-        # NR
-        for nr_entry in entry["nr_info"]:
-            temp_out = overview_dict.copy()
-            temp_out["lte/nr"] = (
-                "nr-SignalStrAPI" if nr_entry["isSignalStrAPI"] else "nr")
-            temp_out["pci"] = util.clean_signal(nr_entry["nrPci"])
-            temp_out["lte-ci/nr-nci"] = util.clean_signal(nr_entry["nci"])
-            temp_out["lte-earfcn/nr-arfcn"] = util.clean_signal(
-                nr_entry["nrarfcn"])
-            temp_out["band*"] = cell_helper.nrarfcn_to_band(
-                temp_out["lte-earfcn/nr-arfcn"],
-                reg=cell_helper.REGION[options.region])
-            temp_out["freq_mhz*"] = cell_helper.nrarfcn_to_freq(
-                temp_out["lte-earfcn/nr-arfcn"])
-            temp_out["width_mhz"] = "NaN"
-            temp_out["rsrp_dbm"] = util.clean_signal(nr_entry["ssRsrp"])
-            temp_out["rsrq_db"] = util.clean_signal(nr_entry["ssRsrq"])
-            temp_out["lte-rssi/nr-sinr_dbm"] = util.clean_signal(
-                nr_entry["ssSinr"])
-            temp_out["primary/other*"] = (
-                "primary" if nr_entry["status"] == "primary" else "other")
-            output_list.append(temp_out)
-            has_data = True
-
-        # Rest of LTE
-        lte_others = [val for val in entry["cell_info"] if val != lte_primary]
-        for lte_entry in lte_others:
-            temp_out = overview_dict.copy()
-            temp_out["lte/nr"] = "lte"
-            temp_out["pci"] = util.clean_signal(lte_entry["pci"])
-            temp_out["lte-ci/nr-nci"] = util.clean_signal(lte_entry["ci"])
-            temp_out["lte-earfcn/nr-arfcn"] = util.clean_signal(
-                lte_entry["earfcn"])
-            temp_out["band*"] = cell_helper.earfcn_to_band(
-                temp_out["lte-earfcn/nr-arfcn"])
-            temp_out["freq_mhz*"] = cell_helper.earfcn_to_freq(
-                temp_out["lte-earfcn/nr-arfcn"])
-            temp_out["width_mhz"] = util.clean_signal(lte_entry["width"])
-            temp_out["rsrp_dbm"] = util.clean_signal(lte_entry["rsrp"])
-            temp_out["rsrq_db"] = util.clean_signal(lte_entry["rsrq"])
-            temp_out["lte-rssi/nr-sinr_dbm"] = util.clean_signal(
-                lte_entry["rssi"])
-            temp_out["primary/other*"] = "other"
-            output_list.append(temp_out)
-            has_data = True
-
-        if not has_data:
-            temp_out = overview_dict.copy()
-            temp_out["lte/nr"] = "lte"
-            temp_out["pci"] = "NaN"
-            temp_out["lte-ci/nr-nci"] = "NaN"
-            temp_out["lte-earfcn/nr-arfcn"] = "NaN"
-            temp_out["band*"] = "NaN"
-            temp_out["freq_mhz*"] = "NaN"
-            temp_out["width_mhz"] = "NaN"
-            temp_out["rsrp_dbm"] = "NaN"
-            temp_out["rsrq_db"] = "NaN"
-            temp_out["lte-rssi/nr-sinr_dbm"] = "NaN"
-            temp_out["primary/other*"] = "other"
-            output_list.append(temp_out)
+def iter_file_rows(file, options, file_cache=None):
+    # Rows of a single input file, converted a batch of entries at a time
+    convert = profiler.timed("convert", cb_process)
+    for sigcap in loader.iter_file_batches(
+            file, file_cache, backend=options.json_backend):
+        rows = list()
+        convert({"files": [file], "json": sigcap, "options": options}, rows)
+        yield from rows
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("input", type=Path,
                         help="input SigCap folder or file")
-    parser.add_argument("output_file", type=argparse.FileType('w'),
-                        help="output CSV file with .csv suffix")
+    parser.add_argument("output_file", type=Path,
+                        help="output CSV file with .csv suffix, or "
+                             ".csv.gz, .csv.bz2 or .csv.xz to compress it")
+    parser.add_argument("--compression",
+                        choices=["auto", "none", "gzip", "bz2", "xz"],
+                        default="auto",
+                        help="compress the output CSV in a background "
+                             "thread, auto picks it from the .gz, .bz2 or "
+                             ".xz suffix of output_file, default=auto")
     parser.add_argument("--filter", type=str,
                         help="filter of JSON string or path to JSON file")
     parser.add_argument("--region", choices=cell_helper.REGION.keys(),
@@ -163,35 +60,157 @@ def main():
                         help="Region for NR band conversion, default=NAR")
     parser.add_argument("--include-invalid-op", action="store_true",
                         help="include invalid operator names")
+    sort_group = parser.add_mutually_exclusive_group()
+    sort_group.add_argument("--no-sort", action="store_true",
+                            help="write rows as they are converted, in "
+                                 "input order, instead of sorting them by "
+                                 "timestamp")
+    sort_group.add_argument("--presorted", action="store_true",
+                            help="input files are each sorted by time, "
+                                 "write rows while merging the files instead "
+                                 "of buffering them, more than "
+                                 f"{sorter.MERGE_GROUP} files are merged in "
+                                 "groups through temporary files, stops if "
+                                 "a file is out of order")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only convert input files that are new since "
+                             "the last run and merge their rows into the "
+                             "existing output, rebuilding it if a converted "
+                             "file or an option changed")
+    parser.add_argument("--manifest", type=Path,
+                        help="manifest of the converted files for "
+                             "--incremental, default=output_file with a "
+                             ".manifest.json suffix")
+    parser.add_argument("--memory-budget", type=float,
+                        help="approximate memory in MB for buffered output "
+                             "rows, spill sorted runs to temporary files "
+                             "beyond it")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes decoding input files, "
+                             "default=1")
+    parser.add_argument("--json-backend", choices=loader.JSON_BACKENDS,
+                        default="stdlib",
+                        help="JSON decoder, stdlib streams the entries of "
+                             "each file, orjson and ujson are faster but "
+                             "read each file whole, so memory grows with the "
+                             "largest file, auto uses orjson or ujson if "
+                             "installed, default=stdlib")
+    parser.add_argument("--index", type=Path,
+                        help="index from sigcap_index.py, used to skip "
+                             "files that cannot match --filter")
+    parser.add_argument("--cache-dir", type=Path,
+                        help="cache decoded input files in this folder")
+    parser.add_argument("--cache-size", type=float, default=1024,
+                        help="maximum cache size in MB, default=1024")
+    parser.add_argument("--profile", type=Path,
+                        help="write stage and helper timings to this JSON "
+                             "file, and collapsed stacks next to it with a "
+                             ".folded suffix")
     parser.add_argument("--log-level", default="warning",
                         help="Log level, default=warning")
     args = parser.parse_args()
+    if (args.incremental and (args.no_sort or args.presorted)):
+        parser.error("--incremental merges sorted rows, it cannot be "
+                     "combined with --no-sort or --presorted")
     logging.basicConfig(level=args.log_level.upper())
+    if (args.profile is not None):
+        profiler.start()
 
     if (args.filter is not None):
         args.filter = util.create_json_filter(args.filter)
         print(f"Using filter: {args.filter}")
 
-    global output_list
+    args.json_backend = loader.resolve_backend(args.json_backend)
+    file_cache = (None if args.cache_dir is None
+                  else cache.FileCache(args.cache_dir, args.cache_size))
+    index = (None if args.index is None
+             else file_index.FileIndex(args.index))
+
+    # Only the new files are converted, unless the output has to be rebuilt
+    incremental = None
+    new_files = None
+    if (args.incremental):
+        incremental = manifest.Manifest(
+            args.manifest or manifest.default_path(args.output_file))
+        new_files = incremental.plan(
+            loader.list_files(args.input),
+            {name: getattr(args, name) for name in cellular.OPTIONS},
+            args.output_file)
+        if (new_files is None):
+            print(f"Converting all files into {args.output_file}")
+        else:
+            print(f"Converting {len(new_files)} new files into "
+                  f"{args.output_file}")
 
-    print("===== Start processing! =====")
-    loader.load_json(args.input, cb_process, options=args)
-    output_list = sorted(output_list, key=lambda x: x["timestamp"])
+    global output_list
+    # Without sorting, rows go to the output file as soon as they are
+    # converted. The output file is only replaced once all rows are
+    # written, so a failed run leaves it as it was.
+    streaming = args.no_sort or args.presorted
+    with ExitStack() as outputs:
+        if (streaming):
+            print(f"Writing to {args.output_file} ...")
+            output_file = outputs.enter_context(
+                writer.replace_output(args.output_file, args.compression))
+            output_list = writer.RowWriter(output_file, COLUMNS)
+        else:
+            output_list = sorter.RowSorter(
+                key=util.timestamp_key(TIMESTAMP),
+                memory_budget=args.memory_budget)
+
+        print("===== Start processing! =====")
+        if (args.presorted):
+            input_files = loader.scan_files(args.input, index, args.filter)
+            try:
+                output_list.extend(sorter.merge_sorted(
+                    [(file, iter_file_rows(file, args, file_cache))
+                     for file in input_files],
+                    key=util.timestamp_key(TIMESTAMP)))
+            except sorter.UnsortedError as err:
+                sys.exit(f"{err}, --presorted needs input files with "
+                         "entries in time order")
+        else:
+            loader.load_json(args.input,
+                             profiler.timed("convert", cb_process),
+                             options=args, workers=args.workers,
+                             cache=file_cache, index=index,
+                             filter_obj=args.filter,
+                             backend=args.json_backend, files=new_files)
+        # Leaving the block flushes the streamed rows and waits for the
+        # compression thread
     logging.info(f"Len output_list {len(output_list)}")
 
     if len(output_list) > 0:
-        print(f"Writing to {args.output_file.name} ...")
-        logging.debug(f"Header list: {','.join(output_list[0].keys())}")
-        csv_writer = csv.DictWriter(
-            args.output_file,
-            fieldnames=output_list[0].keys())
-        csv_writer.writeheader()
-        csv_writer.writerows(output_list)
+        if (not streaming):
+            print(f"Writing to {args.output_file} ...")
+            # Rows are sorted as they are written, timed as sort within
+            # the write stage
+            rows = profiler.timed_iter("sort", output_list.sorted())
+            with profiler.stage("write"):
+                if (new_files is not None):
+                    num_rows = writer.merge_output(
+                        args.output_file, COLUMNS, rows,
+                        util.timestamp_key(TIMESTAMP),
+                        compression=args.compression)
+                    print(f"Merged into {num_rows} rows")
+                else:
+                    with writer.open_output(
+                            args.output_file,
+                            args.compression) as output_file:
+                        writer.RowWriter(output_file, COLUMNS).extend(rows)
 
         print(f"DONE!")
+    elif (new_files is not None):
+        print("No new data! Output is up to date.")
     else:
         print("Empty data! Nothing to write.")
 
+    if (incremental is not None):
+        incremental.commit()
+        incremental.save()
+
+    profiler.stop(args.profile)
+
 
 if __name__ == "__main__":
     main()
@@ -1,116 +1,81 @@
 import argparse
-import csv
-from datetime import datetime, timedelta
+from contextlib import ExitStack
+import heapq
+import itertools
+from lib import cache
+from lib import file_index
 from lib import loader
-from lib import filter_json
+from lib import manifest
+from lib import profiler
+from lib import sorter
 from lib import util
-from lib import wifi_helper
+from lib import wifi
+from lib import writer
 import logging
 from pathlib import Path
+import sys
 
+COLUMNS = wifi.COLUMNS
+TIMESTAMP = wifi.TIMESTAMP
+UUID = wifi.UUID
 output_list = list()
-device_timedata = dict()
+device_timedata = wifi.create_dedup()
 
 
-def cb_process(obj):
+def cb_process(obj, out=None):
     print(f"Processing... # of data: {len(obj['json'])}")
     if len(obj["files"]) < 10:
         print(f"Files: {','.join(obj['files'])}")
-
-    sigcap = obj['json']
-    options = obj['options']
-    logging.info(options)
-    global output_list, device_timedata
-
-    # If filter exist, filter the sigcap object
-    if (options.filter is not None):
-        sigcap = filter_json.filter_array(options.filter, sigcap)
-        print(f"After filter, # of data: {len(sigcap)}")
-
-    for entry in sigcap:
-        if entry["uuid"] not in device_timedata:
-            device_timedata[entry["uuid"]] = list()
-
-        overview_dict = {
-            "sigcap_version": entry["version"],
-            "android_version": entry["androidVersion"],
-            "is_debug": entry["isDebug"],
-            "uuid": entry["uuid"],
-            "device_name": entry["deviceName"],
-            "latitude": entry["location"]["latitude"],
-            "longitude": entry["location"]["longitude"],
-            "altitude": entry["location"]["altitude"],
-            "hor_acc": entry["location"]["hor_acc"],
-            "ver_acc": entry["location"]["ver_acc"],
-        }
-        timestamp = datetime.fromisoformat(entry["datetimeIso"])
-
-        for wifi_entry in entry["wifi_info"]:
-            freq_code = wifi_helper.get_freq_code(wifi_entry["primaryFreq"])
-            if ((getattr(options, "skip_2.4ghz") and freq_code == "2.4")
-                    or (options.skip_5ghz and freq_code == "5")
-                    or (options.skip_6ghz and freq_code == "6")):
-                continue
-
-            timedelta_ms = timedelta(
-                milliseconds=wifi_entry["timestampDeltaMs"])
-            actual_timestamp = timestamp - timedelta_ms
-            if actual_timestamp.timestamp() in device_timedata[entry["uuid"]]:
-                continue
-
-            device_timedata[entry["uuid"]].append(actual_timestamp.timestamp())
-            temp_out = overview_dict.copy()
-            temp_out["timestamp"] = actual_timestamp.isoformat()
-            temp_out["ssid"] = (wifi_entry["ssid"]
-                                if "ssid" in wifi_entry else "")
-            temp_out["bssid"] = wifi_entry["bssid"]
-            temp_out["primary_freq_mhz"] = wifi_entry["primaryFreq"]
-            temp_out["center_freq_mhz"] = (
-                wifi_entry["centerFreq0"] if wifi_entry["centerFreq1"] == 0
-                else wifi_entry["centerFreq1"])
-            temp_out["width_mhz"] = wifi_entry["width"]
-            temp_out["channel_num"] = wifi_helper.get_channel_from_freq(
-                wifi_entry["primaryFreq"], wifi_entry["width"])
-            temp_out["primary_ch_num"] = wifi_helper.get_channel_from_freq(
-                wifi_entry["primaryFreq"], 20)
-            temp_out["rssi_dbm"] = util.clean_signal(
-                wifi_entry["rssi"])
-            temp_out["standard"] = wifi_entry["standard"]
-            temp_out["connected"] = wifi_entry["connected"]
-            temp_out["link_speed"] = util.clean_signal(
-                wifi_entry["linkSpeed"])
-            temp_out["tx_link_speed"] = util.clean_signal(
-                wifi_entry["txLinkSpeed"])
-            temp_out["rx_link_speed"] = util.clean_signal(
-                wifi_entry["rxLinkSpeed"])
-            temp_out["max_supported_tx_link_speed"] = util.clean_signal(
-                wifi_entry["maxSupportedTxLinkSpeed"])
-            temp_out["max_supported_rx_link_speed"] = util.clean_signal(
-                wifi_entry["maxSupportedRxLinkSpeed"])
-            temp_out["capabilities"] = wifi_entry["capabilities"]
-            temp_out["sta_count"] = util.clean_signal(wifi_entry["staCount"])
-            if temp_out["sta_count"] == -1:
-                temp_out["sta_count"] = "NaN"
-            temp_out["ch_util"] = util.clean_signal(wifi_entry["chUtil"])
-            if temp_out["ch_util"] == -1:
-                temp_out["ch_util"] = "NaN"
-            temp_out["tx_power_dbm"] = util.clean_signal(wifi_entry["txPower"])
-            temp_out["link_margin_db"] = util.clean_signal(
-                wifi_entry["linkMargin"])
-            temp_out["aruba_ap_name"] = (wifi_entry["apName"]
-                                         if ("apName" in wifi_entry
-                                             and wifi_entry["apName"])
-                                         else "unknown")
-
-            output_list.append(temp_out)
+    logging.info(obj["options"])
+
+    if (out is None):
+        out = output_list
+    out.extend(wifi.convert_wifi(obj["json"], obj["options"],
+                                 device_timedata))
+
+
+def iter_file_rows(file, options, file_cache=None):
+    # Rows of a single input file with its entries in time order, converted
+    # a batch of entries at a time. AP timestamps go back from their
+    # entry's timestamp by up to timestampDeltaMs, so a later batch can
+    # still give older rows. Rows wait in a heap until they are older than
+    # the latest entry minus the largest delta seen so far.
+    convert = profiler.timed("convert", cb_process)
+    key = util.timestamp_key(TIMESTAMP)
+    pending = list()
+    order = itertools.count()
+    max_delta = 0
+    for sigcap in loader.iter_file_batches(
+            file, file_cache, backend=options.json_backend):
+        rows = list()
+        convert({"files": [file], "json": sigcap, "options": options}, rows)
+        for row in rows:
+            # Rows with equal timestamps keep their order
+            heapq.heappush(pending, (key(row), next(order), row))
+        max_delta = max([max_delta] + [
+            wifi_entry["timestampDeltaMs"]
+            for entry in sigcap for wifi_entry in entry["wifi_info"]])
+        watermark = (util.parse_timestamp(sigcap[-1]["datetimeIso"])
+                     - round(max_delta * 1000) * 1000)
+        while (len(pending) > 0 and pending[0][0] <= watermark):
+            yield heapq.heappop(pending)[2]
+    while (len(pending) > 0):
+        yield heapq.heappop(pending)[2]
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("input", type=Path,
                         help="input SigCap folder or file")
-    parser.add_argument("output_file", type=argparse.FileType('w'),
-                        help="output CSV file with .csv suffix")
+    parser.add_argument("output_file", type=Path,
+                        help="output CSV file with .csv suffix, or "
+                             ".csv.gz, .csv.bz2 or .csv.xz to compress it")
+    parser.add_argument("--compression",
+                        choices=["auto", "none", "gzip", "bz2", "xz"],
+                        default="auto",
+                        help="compress the output CSV in a background "
+                             "thread, auto picks it from the .gz, .bz2 or "
+                             ".xz suffix of output_file, default=auto")
     parser.add_argument("--filter", type=str,
                         help="filter of JSON string or path to JSON file")
     parser.add_argument("--skip-2.4ghz", action="store_true",
@@ -119,35 +84,169 @@ def main():
                         help="Skip 2.4 GHz Wi-Fi APs")
     parser.add_argument("--skip-6ghz", action="store_true",
                         help="Skip 2.4 GHz Wi-Fi APs")
+    parser.add_argument("--dedup-window", type=float,
+                        help="forget timestamps older than this many "
+                             "seconds before the latest one of a device when "
+                             "skipping duplicates, needs time-ordered input")
+    sort_group = parser.add_mutually_exclusive_group()
+    sort_group.add_argument("--no-sort", action="store_true",
+                            help="write rows as they are converted, in "
+                                 "input order, instead of sorting them by "
+                                 "timestamp")
+    sort_group.add_argument("--presorted", action="store_true",
+                            help="input files are each sorted by time, "
+                                 "write rows while merging the files instead "
+                                 "of buffering them, more than "
+                                 f"{sorter.MERGE_GROUP} files are merged in "
+                                 "groups through temporary files, stops if "
+                                 "a file is out of order")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only convert input files that are new since "
+                             "the last run and merge their rows into the "
+                             "existing output, rebuilding it if a converted "
+                             "file or an option changed")
+    parser.add_argument("--manifest", type=Path,
+                        help="manifest of the converted files for "
+                             "--incremental, default=output_file with a "
+                             ".manifest.json suffix")
+    parser.add_argument("--memory-budget", type=float,
+                        help="approximate memory in MB for buffered output "
+                             "rows, spill sorted runs to temporary files "
+                             "beyond it")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes decoding input files, "
+                             "default=1")
+    parser.add_argument("--json-backend", choices=loader.JSON_BACKENDS,
+                        default="stdlib",
+                        help="JSON decoder, stdlib streams the entries of "
+                             "each file, orjson and ujson are faster but "
+                             "read each file whole, so memory grows with the "
+                             "largest file, auto uses orjson or ujson if "
+                             "installed, default=stdlib")
+    parser.add_argument("--index", type=Path,
+                        help="index from sigcap_index.py, used to skip "
+                             "files that cannot match --filter")
+    parser.add_argument("--cache-dir", type=Path,
+                        help="cache decoded input files in this folder")
+    parser.add_argument("--cache-size", type=float, default=1024,
+                        help="maximum cache size in MB, default=1024")
+    parser.add_argument("--profile", type=Path,
+                        help="write stage and helper timings to this JSON "
+                             "file, and collapsed stacks next to it with a "
+                             ".folded suffix")
     parser.add_argument("--log-level", default="warning",
                         help="Log level, default=warning")
     args = parser.parse_args()
+    if (args.incremental and (args.no_sort or args.presorted)):
+        parser.error("--incremental merges sorted rows, it cannot be "
+                     "combined with --no-sort or --presorted")
     logging.basicConfig(level=args.log_level.upper())
+    if (args.profile is not None):
+        profiler.start()
 
     if (args.filter is not None):
         args.filter = util.create_json_filter(args.filter)
         print(f"Using filter: {args.filter}")
 
-    global output_list
+    args.json_backend = loader.resolve_backend(args.json_backend)
+    file_cache = (None if args.cache_dir is None
+                  else cache.FileCache(args.cache_dir, args.cache_size))
+    index = (None if args.index is None
+             else file_index.FileIndex(args.index))
 
-    print("===== Start processing! =====")
-    loader.load_json(args.input, cb_process, options=args)
-    output_list = sorted(output_list, key=lambda x: x["timestamp"])
+    global output_list, device_timedata
+    device_timedata = wifi.create_dedup(args.dedup_window)
+
+    # Only the new files are converted, unless the output has to be rebuilt
+    incremental = None
+    new_files = None
+    if (args.incremental):
+        incremental = manifest.Manifest(
+            args.manifest or manifest.default_path(args.output_file))
+        new_files = incremental.plan(
+            loader.list_files(args.input),
+            {name: getattr(args, name) for name in wifi.OPTIONS},
+            args.output_file)
+        if (new_files is None):
+            print(f"Converting all files into {args.output_file}")
+        else:
+            print(f"Converting {len(new_files)} new files into "
+                  f"{args.output_file}")
+            # Records already in the output count as seen
+            with writer.read_output(args.output_file,
+                                    args.compression) as (_, rows):
+                for row in rows:
+                    device_timedata.is_duplicate(
+                        row[UUID], util.parse_timestamp(row[TIMESTAMP]))
+
+    # Without sorting, rows go to the output file as soon as they are
+    # converted. The output file is only replaced once all rows are
+    # written, so a failed run leaves it as it was.
+    streaming = args.no_sort or args.presorted
+    with ExitStack() as outputs:
+        if (streaming):
+            print(f"Writing to {args.output_file} ...")
+            output_file = outputs.enter_context(
+                writer.replace_output(args.output_file, args.compression))
+            output_list = writer.RowWriter(output_file, COLUMNS)
+        else:
+            output_list = sorter.RowSorter(
+                key=util.timestamp_key(TIMESTAMP),
+                memory_budget=args.memory_budget)
+
+        print("===== Start processing! =====")
+        if (args.presorted):
+            input_files = loader.scan_files(args.input, index, args.filter)
+            try:
+                output_list.extend(sorter.merge_sorted(
+                    [(file, iter_file_rows(file, args, file_cache))
+                     for file in input_files],
+                    key=util.timestamp_key(TIMESTAMP)))
+            except sorter.UnsortedError as err:
+                sys.exit(f"{err}, --presorted needs input files with "
+                         "entries in time order")
+        else:
+            loader.load_json(args.input,
+                             profiler.timed("convert", cb_process),
+                             options=args, workers=args.workers,
+                             cache=file_cache, index=index,
+                             filter_obj=args.filter,
+                             backend=args.json_backend, files=new_files)
+        # Leaving the block flushes the streamed rows and waits for the
+        # compression thread
     logging.info(f"Len output_list {len(output_list)}")
 
     if len(output_list) > 0:
-        print(f"Writing to {args.output_file.name} ...")
-        logging.debug(f"Header list: {','.join(output_list[0].keys())}")
-        csv_writer = csv.DictWriter(
-            args.output_file,
-            fieldnames=output_list[0].keys())
-        csv_writer.writeheader()
-        csv_writer.writerows(output_list)
+        if (not streaming):
+            print(f"Writing to {args.output_file} ...")
+            # Rows are sorted as they are written, timed as sort within
+            # the write stage
+            rows = profiler.timed_iter("sort", output_list.sorted())
+            with profiler.stage("write"):
+                if (new_files is not None):
+                    num_rows = writer.merge_output(
+                        args.output_file, COLUMNS, rows,
+                        util.timestamp_key(TIMESTAMP),
+                        compression=args.compression)
+                    print(f"Merged into {num_rows} rows")
+                else:
+                    with writer.open_output(
+                            args.output_file,
+                            args.compression) as output_file:
+                        writer.RowWriter(output_file, COLUMNS).extend(rows)
 
         print(f"DONE!")
+    elif (new_files is not None):
+        print("No new data! Output is up to date.")
     else:
         print("Empty data! Nothing to write.")
 
+    if (incremental is not None):
+        incremental.commit()
+        incremental.save()
+
+    profiler.stop(args.profile)
+
 
 if __name__ == "__main__":
     main()
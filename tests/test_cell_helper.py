@@ -0,0 +1,82 @@
+from lib import cell_helper
+import numpy as np
+
+
+def earfcn_to_band_linear(earfcn):
+    for cell in cell_helper.cell_table:
+        if cell[1] <= earfcn and cell[2] >= earfcn:
+            return cell[0]
+    return 0
+
+
+def earfcn_to_freq_linear(earfcn):
+    for cell in cell_helper.cell_table:
+        if cell[1] <= earfcn and cell[2] >= earfcn:
+            return (cell[3] + 0.1 * (earfcn - cell[1]))
+    return 0.0
+
+
+def test_earfcn_lookup():
+    earfcns = list(range(-2, 70700)) + [255144, 256143, 256144, 262143,
+                                        262144, 2147483647]
+    for earfcn in earfcns:
+        assert cell_helper.earfcn_to_band(earfcn) \
+            == earfcn_to_band_linear(earfcn)
+        assert cell_helper.earfcn_to_freq(earfcn) \
+            == earfcn_to_freq_linear(earfcn)
+    assert cell_helper.earfcn_to_band("NaN") == "N/A"
+    assert cell_helper.earfcn_to_freq("NaN") == "N/A"
+
+
+def test_earfcn_to_band_freq_array():
+    earfcns = [0, 599, 600, 5010, 5009, 66786, 70645, 70646, 2147483647]
+    bands, freqs = cell_helper.earfcn_to_band_freq_array(earfcns)
+    assert bands.tolist() == [earfcn_to_band_linear(val) for val in earfcns]
+    assert freqs.tolist() == [earfcn_to_freq_linear(val) for val in earfcns]
+
+    bands, freqs = cell_helper.earfcn_to_band_freq_array(
+        np.array(["NaN", 5110], dtype=object))
+    assert bands.tolist() == ["N/A", 12]
+    assert freqs.tolist() == ["N/A", cell_helper.earfcn_to_freq(5110)]
+
+
+def nrarfcn_to_band_linear(nrarfcn, reg):
+    ret = [cell for cell in cell_helper.nr_table
+           if (cell[1] <= nrarfcn and cell[2] >= nrarfcn
+               and ((reg & cell[3])
+                    or cell[3] == cell_helper.REGION["UNKNOWN"]))]
+    while len(ret) > 1:
+        smallest = min(ret, key=lambda x: x[2] - x[1])
+        if (smallest[3] == cell_helper.REGION["GLOBAL"]
+                or smallest[3] == reg):
+            ret = [smallest]
+        else:
+            ret = [val for val in ret if val[0] != smallest[0]]
+    return "N/A" if len(ret) == 0 else f"n{ret[0][0]}"
+
+
+def test_nrarfcn_to_band():
+    nrarfcns = sorted({val + offset for cell in cell_helper.nr_table
+                       for val in cell[1:3] for offset in (-1, 0, 1)})
+    nrarfcns += [0, 5000000, 434000.5]
+    for reg in cell_helper.REGION.values():
+        for nrarfcn in nrarfcns:
+            assert cell_helper.nrarfcn_to_band(nrarfcn, reg=reg) \
+                == nrarfcn_to_band_linear(nrarfcn, reg)
+        bands = cell_helper.nrarfcn_to_band_array(nrarfcns, reg=reg)
+        assert bands.tolist() == [nrarfcn_to_band_linear(val, reg)
+                                  for val in nrarfcns]
+    assert cell_helper.nrarfcn_to_band("NaN") == "N/A"
+    assert cell_helper.nrarfcn_to_band_array(["NaN", 640000]).tolist() \
+        == ["N/A", "n48"]
+
+
+def test_nrarfcn_to_band_multiple():
+    nar = cell_helper.REGION["NAR"]
+    assert cell_helper.nrarfcn_to_band(
+        650000, reg=nar, multiple=True) == "n77,n78"
+    assert cell_helper.nrarfcn_to_band(
+        434000, reg=nar, multiple=True) == "n1,n65,n66"
+    assert cell_helper.nrarfcn_to_band(0, multiple=True) == "N/A"
+    assert cell_helper.nrarfcn_to_band_array(
+        [650000, 0], reg=nar, multiple=True).tolist() == ["n77,n78", "N/A"]
@@ -0,0 +1,35 @@
+from lib import columnar
+import numpy as np
+import pytest
+
+
+FIELDNAMES = ["num", "val", "flag", "band", "rsrp", "extra"]
+ROWS = [
+    (1, 1.5, True, "n71", -90, None),
+    (2, "NaN", False, "N/A", -95, None),
+    (3, 2, True, "n71", "NaN", "x"),
+]
+
+
+@pytest.mark.parametrize("layout,name", [("npz", "out.npz"), ("npy", "out")])
+def test_column_writer(tmp_path, layout, name):
+    column_writer = columnar.ColumnWriter(tmp_path / name, FIELDNAMES,
+                                          layout=layout)
+    column_writer.extend(ROWS)
+    assert len(column_writer) == 3
+    column_writer.close()
+
+    columns = columnar.load(tmp_path / name)
+    assert list(columns) == FIELDNAMES
+    assert columns["num"].dtype == np.int64
+    assert columns["num"].tolist() == [1, 2, 3]
+    assert columns["flag"].dtype == np.bool_
+    np.testing.assert_array_equal(columns["val"], [1.5, np.nan, 2.0])
+    np.testing.assert_array_equal(columns["rsrp"], [-90, -95, np.nan])
+
+    codes, categories = columns["band"]
+    assert codes.tolist() == [0, -1, 0]
+    assert categories.tolist() == ["n71"]
+    codes, categories = columns["extra"]
+    assert categories[codes[2]] == "x"
+    assert codes[:2].tolist() == [-1, -1]
@@ -0,0 +1,342 @@
+import copy
+import csv
+from datetime import datetime, timedelta
+import json
+import numpy as np
+import pytest
+import sigcap_to_all_csv
+import sigcap_to_cellular_csv
+import sigcap_to_csv
+import sigcap_to_wifi_csv
+import sys
+from lib import cellular
+from lib import dedup
+from lib import file_index
+from lib import loader
+from lib import sorter
+from lib import util
+from lib import wide
+from lib import wifi
+
+
+def lte(status, pci, earfcn, rsrp):
+    return {"status": status, "width": 20000, "pci": pci, "ci": 1,
+            "earfcn": earfcn, "rsrp": rsrp, "rsrq": -10, "rssi": -60,
+            "cqi": 7, "rssnr": 10, "timing": 1}
+
+
+def ap(bssid, freq, connected=False, delta_ms=0):
+    return {"bssid": bssid, "ssid": "x", "primaryFreq": freq,
+            "centerFreq0": freq, "centerFreq1": 0, "width": 20, "rssi": -70,
+            "standard": "11ax", "connected": connected, "linkSpeed": 100,
+            "txLinkSpeed": 100, "rxLinkSpeed": 100,
+            "maxSupportedTxLinkSpeed": 200, "maxSupportedRxLinkSpeed": 200,
+            "capabilities": "[ESS]", "staCount": -1, "chUtil": 10,
+            "txPower": 20, "linkMargin": 5, "timestampDeltaMs": delta_ms}
+
+
+def entry(uuid, datetime_iso, op="T-Mobile", num_lte=2, aps=()):
+    return {
+        "version": "3.5", "androidVersion": 13, "isDebug": False,
+        "uuid": uuid, "deviceName": "Pixel",
+        "datetimeIso": datetime_iso,
+        "location": {"latitude": 41.8, "longitude": -87.6, "altitude": 180,
+                     "hor_acc": 3, "ver_acc": 1},
+        "opName": op, "simName": "", "carrierName": "",
+        "overrideNetworkType": "NONE", "phoneType": "GSM",
+        "nrStatus": "NONE", "nrAvailable": False, "dcNrRestricted": False,
+        "enDcAvailable": False, "nrFrequencyRange": "UNKNOWN",
+        "cellBandwidths": "[20000]", "usingCA": False,
+        "cell_info": ([lte("primary", 1, 5110, -80)]
+                      + [lte("other", i + 2, 2000, -90 - i)
+                         for i in range(num_lte - 1)]),
+        "nr_info": [{"status": "other", "width": 0, "isSignalStrAPI": False,
+                     "nrPci": 7, "nci": 1, "nrarfcn": 520110,
+                     "ssRsrp": -90, "ssRsrq": -10, "ssSinr": 5,
+                     "csiRsrp": -90, "csiRsrq": -10, "csiSinr": 5}],
+        "wifi_info": list(aps),
+    }
+
+
+RECORDS = [
+    entry("dev-1", "2023-05-01T12:00:00.000-0500", num_lte=3,
+          aps=[ap("a", 2412, True), ap("b", 5180, delta_ms=100),
+               ap("c", 5180, delta_ms=200)]),
+    entry("dev-2", "2023-05-01T12:00:01.000-0500", op="Verizon",
+          aps=[ap("d", 5955)]),
+    entry("dev-1", "2023-05-01T12:00:00.000-0500", num_lte=1,
+          aps=[ap("a", 2412, True)]),
+]
+
+
+def test_convert_cellular():
+    records = copy.deepcopy(RECORDS)
+    rows = list(cellular.convert_cellular(iter(records)))
+    # 3 + 2 + 1 LTE cells and an NR cell per entry
+    assert len(rows) == 9
+    assert all(len(row) == len(cellular.COLUMNS) for row in rows)
+    assert rows[0][cellular.TIMESTAMP] == "2023-05-01T12:00:00.000-0500"
+
+    rows = list(cellular.convert_cellular(
+        records, {"filter": {"opName": "Verizon"}, "region": "GLOBAL"}))
+    assert len(rows) == 3
+    assert records == RECORDS
+
+
+def test_convert_wifi():
+    rows = list(wifi.convert_wifi(RECORDS))
+    # The last entry repeats the AP of the first at the same time
+    assert [row[wifi.COLUMNS.index("bssid")] for row in rows] == [
+        "a", "b", "c", "d"]
+    assert list(wifi.convert_wifi(RECORDS, {"skip_5ghz": True})) \
+        == [rows[0], rows[3]]
+
+    # A shared dedup carries over between calls
+    device_timedata = dedup.TimestampDedup()
+    assert len(list(wifi.convert_wifi(RECORDS[0:1], None,
+                                      device_timedata))) == 3
+    assert len(list(wifi.convert_wifi(RECORDS[2:3], None,
+                                      device_timedata))) == 0
+
+
+def test_wide_converter_reentrant():
+    def run(converter):
+        rows = list(converter.convert(RECORDS))
+        assert all(len(row) == len(wide.ROW_KEYS) for row in rows)
+        limits = converter.get_limits()
+        header = converter.get_header(limits)
+        rows = [converter.expand_row(row, limits) for row in rows]
+        assert all(len(row) == len(header) for row in rows)
+        return header, rows
+
+    expected_all = run(wide.WideConverter())
+    expected_capped = run(wide.WideConverter({"max_lte": 1, "max_wifi": 0}))
+    assert len(expected_capped[0]) < len(expected_all[0])
+
+    # Conversions interleaved in one process keep their own state
+    first = wide.WideConverter()
+    second = wide.WideConverter({"max_lte": 1, "max_wifi": 0})
+    first_rows = list()
+    second_rows = list()
+    for record in RECORDS:
+        first_rows += first.convert([record])
+        second_rows += wide.convert_wide([record], converter=second)
+    assert first.max_counts["max_lte"] == 3
+    assert first.max_counts["max_wifi_5"] == 2
+    for converter, rows, expected in [(first, first_rows, expected_all),
+                                      (second, second_rows, expected_capped)]:
+        limits = converter.get_limits()
+        assert converter.get_header(limits) == expected[0]
+        assert [converter.expand_row(row, limits) for row in rows] \
+            == expected[1]
+    assert RECORDS[0]["cell_info"][0]["status"] == "primary"
+    assert len(RECORDS[0]["cell_info"]) == 3
+
+
+def test_segment_stats():
+    rng = np.random.default_rng(0)
+    counts = [0, 1, 3, 0, 40, 2]
+    values = rng.normal(-70, 10, sum(counts))
+    means, stds = util.segment_stats(values, counts)
+    start = 0
+    for count, mean, std in zip(counts, means, stds):
+        segment = values[start:start + count]
+        start += count
+        if (count == 0):
+            assert np.isnan(mean) and np.isnan(std)
+        else:
+            assert np.isclose(mean, np.mean(segment), rtol=1e-12)
+            assert np.isclose(std, np.std(segment), rtol=1e-12)
+
+
+def test_wide_batch_stats():
+    records = copy.deepcopy(RECORDS)
+    records[0]["wifi_info"] += [
+        ap(f"x{i}", 5180, delta_ms=i) for i in range(20)]
+    for i, val in enumerate(records[0]["wifi_info"]):
+        val["rssi"] = -90 + i
+    records[0]["iperf_info"] = [{"tputMbps": val, "target": "t"}
+                                for val in [10, 20.5, 31]]
+    records[1]["ping_info"] = [{"time": 12.5}]
+    # Equal values, whose sum is rounded
+    records[2]["wifi_info"] += [
+        ap(f"y{i}", 5180, delta_ms=i) for i in range(9)]
+    for val in records[2]["wifi_info"][1:]:
+        val["rssi"] = -93
+    records[2]["iperf_info"] = [{"tputMbps": 0.1} for _ in range(10)]
+    converter = wide.WideConverter()
+    rows = list(converter.convert(records))
+    rows = [dict(zip(wide.ROW_KEYS, row)) for row in rows]
+
+    rssi_mw = util.dbm_to_mw(np.array(
+        [val["rssi"] for val in records[0]["wifi_info"][1:]]))
+    assert np.isclose(rows[0]["wifi_5_other_mean_rssi_dbm"],
+                      util.mw_to_dbm(np.mean(rssi_mw)))
+    assert np.isclose(rows[0]["wifi_5_other_stddev_rssi_db"],
+                      util.mw_to_dbm(np.std(rssi_mw)))
+    assert np.isclose(rows[0]["iperf_tput_mean_mbps"], np.mean([10, 20.5, 31]))
+    assert np.isclose(rows[0]["iperf_tput_stddev_mbps"],
+                      np.std([10, 20.5, 31]))
+    assert rows[1]["iperf_tput_mean_mbps"] == "NaN"
+    assert rows[1]["ping_rtt_mean_ms"] == 12.5
+    assert rows[1]["ping_rtt_stddev_ms"] == 0
+    # A single AP has no spread
+    assert rows[1]["wifi_6_other_mean_rssi_dbm"] == -70
+    assert rows[1]["wifi_6_other_stddev_rssi_db"] == "NaN"
+    assert rows[1]["wifi_2.4_other_mean_rssi_dbm"] == "NaN"
+    # Nor do equal ones
+    assert rows[2]["wifi_5_other_mean_rssi_dbm"] \
+        == util.mw_to_dbm(util.dbm_to_mw(-93))
+    assert rows[2]["wifi_5_other_stddev_rssi_db"] == "NaN"
+    assert rows[2]["iperf_tput_mean_mbps"] == 0.1
+    assert rows[2]["iperf_tput_stddev_mbps"] == 0
+
+
+def write_log(path, uuid, start, count, aps):
+    # count entries a second apart, with the APs given by aps(i)
+    start = datetime.fromisoformat(start)
+    records = [entry(uuid, (start + timedelta(seconds=i)).strftime(
+        "%Y-%m-%dT%H:%M:%S.000%z"), aps=aps(i)) for i in range(count)]
+    path.write_text(json.dumps(records))
+
+
+def run_script(monkeypatch, script, *args):
+    monkeypatch.setattr(sys, "argv", [f"{script.__name__}.py"]
+                        + [str(arg) for arg in args])
+    script.main()
+
+
+def run_wifi(monkeypatch, *args):
+    run_script(monkeypatch, sigcap_to_wifi_csv, *args)
+
+
+def read_csv(path):
+    with open(path, newline="") as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def test_wifi_presorted(tmp_path, monkeypatch):
+    # Scans of the first entry of the second batch of 1000 are older than
+    # scans in the first batch, and a second file is interleaved in time
+    (tmp_path / "in").mkdir()
+    write_log(tmp_path / "in" / "a.json", "dev-1",
+              "2023-05-01T12:00:00-05:00", 1200,
+              lambda i: [ap("a", 5180, delta_ms=(
+                  8000 if i == 1000 else i % 5 * 2100))])
+    write_log(tmp_path / "in" / "b.json", "dev-2",
+              "2023-05-01T13:00:00.5-04:00", 50,
+              lambda i: [ap("b", 2412, delta_ms=1500)])
+    run_wifi(monkeypatch, tmp_path / "in", tmp_path / "sorted.csv")
+    run_wifi(monkeypatch, tmp_path / "in", tmp_path / "presorted.csv",
+             "--presorted")
+    rows = read_csv(tmp_path / "presorted.csv")
+    assert len(rows) == 1251
+    assert rows == read_csv(tmp_path / "sorted.csv")
+
+    # Entries out of order past the first batch stop the run and leave the
+    # output as it was
+    write_log(tmp_path / "c.json", "dev-3", "2023-05-01T12:00:00-05:00",
+              1000, lambda i: [ap("c", 2412)])
+    write_log(tmp_path / "d.json", "dev-3", "2023-05-01T11:00:00-05:00",
+              100, lambda i: [ap("c", 2412)])
+    (tmp_path / "in" / "c.json").write_text(json.dumps(
+        json.loads((tmp_path / "c.json").read_text())
+        + json.loads((tmp_path / "d.json").read_text())))
+    (tmp_path / "c.json").unlink()
+    (tmp_path / "d.json").unlink()
+    with pytest.raises(SystemExit, match="c.json is not sorted"):
+        run_wifi(monkeypatch, tmp_path / "in", tmp_path / "presorted.csv",
+                 "--presorted")
+    assert read_csv(tmp_path / "presorted.csv") == rows
+    assert sorted(tmp_path.iterdir()) == [
+        tmp_path / "in", tmp_path / "presorted.csv",
+        tmp_path / "sorted.csv"]
+
+
+def test_wide_incremental_band_edge(tmp_path, monkeypatch):
+    # An AP at 5000 MHz is written with the 5 GHz APs, so it widens them
+    (tmp_path / "in").mkdir()
+    (tmp_path / "inc").mkdir()
+    write_log(tmp_path / "in" / "a.json", "dev-1",
+              "2023-05-01T12:00:00-05:00", 3,
+              lambda i: [ap("edge", 5000, delta_ms=1), ap("a", 5180)])
+    write_log(tmp_path / "in" / "b.json", "dev-2",
+              "2023-05-01T12:00:01-05:00", 3,
+              lambda i: [ap(f"b{j}", 5180 + j * 20, delta_ms=j)
+                         for j in range(3)])
+    assert file_index.summarize_file(
+        tmp_path / "in" / "a.json")["max_wifi_5"] == 2
+
+    run_script(monkeypatch, sigcap_to_csv, tmp_path / "in",
+               tmp_path / "full.csv")
+    (tmp_path / "inc" / "a.json").write_text(
+        (tmp_path / "in" / "a.json").read_text())
+    run_script(monkeypatch, sigcap_to_csv, tmp_path / "inc",
+               tmp_path / "inc.csv", "--incremental")
+    (tmp_path / "inc" / "b.json").write_text(
+        (tmp_path / "in" / "b.json").read_text())
+    run_script(monkeypatch, sigcap_to_csv, tmp_path / "inc",
+               tmp_path / "inc.csv", "--incremental")
+    rows = read_csv(tmp_path / "full.csv")
+    assert sum(row.count("edge") for row in rows) == 3
+    assert read_csv(tmp_path / "inc.csv") == rows
+
+
+def test_presorted_merges_in_groups(tmp_path, monkeypatch):
+    # More files than are merged at once, interleaved in time
+    monkeypatch.setattr(sorter, "MERGE_GROUP", 2)
+    (tmp_path / "in").mkdir()
+    for i in range(5):
+        write_log(tmp_path / "in" / f"{i}.json", f"dev-{i}",
+                  f"2023-05-01T12:00:0{i}-05:00", 20,
+                  lambda j: [ap("a", 2412, delta_ms=j % 3 * 1500)])
+    for script in [sigcap_to_cellular_csv, sigcap_to_wifi_csv]:
+        run_script(monkeypatch, script, tmp_path / "in",
+                   tmp_path / "sorted.csv")
+        run_script(monkeypatch, script, tmp_path / "in",
+                   tmp_path / "presorted.csv", "--presorted")
+        rows = read_csv(tmp_path / "presorted.csv")
+        assert len(rows) > 100
+        assert rows == read_csv(tmp_path / "sorted.csv")
+
+
+def test_json_backend_default_streams(tmp_path, monkeypatch):
+    # Whole-file decoders are only used when asked for
+    def decode(data):
+        raise AssertionError("decoded whole")
+
+    write_log(tmp_path / "a.json", "dev-1", "2023-05-01T12:00:00-05:00", 3,
+              lambda i: [ap("a", 5180)])
+    monkeypatch.setattr(loader, "DECODERS", {"orjson": decode})
+    run_wifi(monkeypatch, tmp_path / "a.json", tmp_path / "out.csv")
+    assert len(read_csv(tmp_path / "out.csv")) == 4
+    with pytest.raises(AssertionError, match="decoded whole"):
+        run_wifi(monkeypatch, tmp_path / "a.json", tmp_path / "out.csv",
+                 "--json-backend", "auto")
+
+
+def test_all_outputs_match_converters(tmp_path, monkeypatch):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "a.json").write_text(json.dumps(RECORDS))
+    write_log(tmp_path / "in" / "b.json", "dev-3",
+              "2023-05-01T11:59:58-05:00", 5,
+              lambda i: [ap("e", 2437, delta_ms=i * 100),
+                         ap("f", 5745, True)])
+    options = ["--filter", '{"opName": "T-Mobile"}']
+    run_script(monkeypatch, sigcap_to_csv, tmp_path / "in",
+               tmp_path / "wide.csv", "--max-lte", "2", *options)
+    run_script(monkeypatch, sigcap_to_cellular_csv, tmp_path / "in",
+               tmp_path / "cellular.csv", *options)
+    run_wifi(monkeypatch, tmp_path / "in", tmp_path / "wifi.csv", *options)
+    # Twice, as a second run in the same process starts over
+    for _ in range(2):
+        run_script(monkeypatch, sigcap_to_all_csv, tmp_path / "in",
+                   "--wide", tmp_path / "all_wide.csv",
+                   "--cellular", tmp_path / "all_cellular.csv",
+                   "--wifi", tmp_path / "all_wifi.csv", "--max-lte", "2",
+                   *options)
+    assert len(sigcap_to_all_csv.outputs) == 3
+    for name, count in [("wide", 8), ("cellular", 22), ("wifi", 13)]:
+        rows = read_csv(tmp_path / f"all_{name}.csv")
+        assert len(rows) == count, name
+        assert rows == read_csv(tmp_path / f"{name}.csv"), name
@@ -0,0 +1,24 @@
+from lib import dedup
+
+
+def test_timestamp_dedup():
+    device_timedata = dedup.TimestampDedup()
+    assert not device_timedata.is_duplicate("dev-1", 10.0)
+    assert not device_timedata.is_duplicate("dev-2", 10.0)
+    assert device_timedata.is_duplicate("dev-1", 10.0)
+    assert not device_timedata.is_duplicate("dev-1", 1000.0)
+    assert device_timedata.is_duplicate("dev-1", 10.0)
+    assert len(device_timedata) == 3
+
+
+def test_timestamp_dedup_window():
+    timestamps = [0.0, 0.5, 0.5, 1.0, 0.8, 2.0, 1.0, 3.0, 3.5, 3.0, 2.9]
+    unbounded = dedup.TimestampDedup()
+    windowed = dedup.TimestampDedup(window=1.0)
+    for timestamp in timestamps:
+        assert (windowed.is_duplicate("dev-1", timestamp)
+                == unbounded.is_duplicate("dev-1", timestamp))
+    assert len(windowed) < len(unbounded)
+
+    # Beyond the window, an old timestamp is no longer recognized
+    assert not windowed.is_duplicate("dev-1", 0.0)
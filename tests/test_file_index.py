@@ -0,0 +1,72 @@
+import json
+from lib import file_index
+
+
+def entry(uuid, op, datetime_iso, num_lte=0, wifi_freqs=[]):
+    return {
+        "uuid": uuid,
+        "opName": op,
+        "simName": "",
+        "carrierName": "",
+        "datetimeIso": datetime_iso,
+        "cell_info": [{}] * num_lte,
+        "nr_info": [],
+        "wifi_info": [{"connected": False, "primaryFreq": freq}
+                      for freq in wifi_freqs],
+    }
+
+
+def write_inputs(tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps([
+        entry("dev-1", "T-Mobile", "2023-05-01T12:00:00.000-0500", 2),
+        entry("dev-1", "T-Mobile", "2023-05-01T13:00:00.000-0500", 1,
+              [2412, 2437, 5180]),
+    ]))
+    (tmp_path / "b.json").write_text(json.dumps([
+        entry("dev-2", "Verizon", "2023-05-02T12:00:00.000-0500", 4,
+              [5955]),
+    ]))
+
+
+def test_summarize_file(tmp_path):
+    write_inputs(tmp_path)
+    summary = file_index.summarize_file(tmp_path / "a.json")
+    assert summary["count"] == 2
+    assert summary["datetime_min"] == "2023-05-01T12:00:00.000-0500"
+    assert summary["datetime_max"] == "2023-05-01T13:00:00.000-0500"
+    assert summary["values"]["uuid"] == ["dev-1"]
+    assert summary["operators"] == ["T-Mobile"]
+    assert summary["max_lte"] == 2
+    assert summary["max_nr"] == 0
+    assert summary["max_wifi_2.4"] == 2
+    assert summary["max_wifi_5"] == 1
+    assert summary["max_wifi_6"] == 0
+
+
+def test_file_index(tmp_path):
+    write_inputs(tmp_path)
+    files = [str(tmp_path / "a.json"), str(tmp_path / "b.json")]
+    index = file_index.FileIndex(tmp_path / "index")
+    assert index.update(files) == 2
+    index.save()
+
+    index = file_index.FileIndex(tmp_path / "index")
+    assert index.update(files) == 0
+    assert index.max_counts(files)["max_lte"] == 4
+    assert index.can_match(files[0], {"uuid": "dev-1"})
+    assert not index.can_match(files[1], {"uuid": "dev-1"})
+    assert index.can_match(files[1], [{"uuid": "dev-1"}, {"opName": "Ver"}])
+    assert not index.can_match(
+        files[1], {"datetimeIso": "<2023-05-02T00:00:00.000-0500"})
+    assert index.can_match(
+        files[0], {"datetimeIso": [">2023-05-01T12:30:00.000-0500",
+                                   "<2023-05-01T12:40:00.000-0500"]})
+
+    # A changed file has no summary until the index is updated
+    (tmp_path / "b.json").write_text(json.dumps([
+        entry("dev-1", "Verizon", "2023-05-03T12:00:00.000-0500")]))
+    assert index.get(files[1]) is None
+    assert index.max_counts(files) is None
+    assert index.can_match(files[1], {"uuid": "dev-3"})
+    assert index.update(files) == 1
+    assert index.can_match(files[1], {"uuid": "dev-1"})
@@ -102,3 +102,80 @@ def test_filter_array():
         [{"num": [">11", "<33"], "data": {"val": ">90"}}, {"name": "foo"}],
         json_input) \
         == [json_input[1], json_input[0], json_input[2], json_input[4]]
+
+
+def test_compile_filter():
+    match = filter_json.compile_filter({"num": [">11", "<33"]})
+    assert [match(val) for val in json_input] == [
+        True, True, False, False, False]
+    match = filter_json.compile_filter(
+        [{"data": {"val": ">90"}}, {"name": "=baz"}])
+    assert [match(val) for val in json_input] == [
+        False, True, True, True, True]
+    assert filter_json.compile_filter({})(json_input[0])
+    assert filter_json.compile_filter({"missing": 1})(json_input[0]) is False
+
+
+def test_compile_filter_date():
+    match = filter_json.compile_filter(
+        {"datetimeIso": [">2023-05-01T12:00:00.000-0500",
+                         "<2023-05-01T14:00:00.000-0400"]})
+    assert match({"datetimeIso": "2023-05-01T12:30:00.000-0500"})
+    assert match({"datetimeIso": "2023-05-01T13:30:00.000-0400"})
+    assert match({"datetimeIso": "2023-05-01T14:30:00.000-0400"}) is False
+    assert match({"datetimeIso": "2023-05-01T16:59:59.000+0000"}) is False
+
+    # Whole columns of dates are parsed at once, with the same result
+    records = [{"datetimeIso": val} for val in [
+        "2023-05-01T12:30:00.000-0500", "2023-05-01T13:30:00.000-0400",
+        "2023-05-01T14:30:00.000-0400", "2023-05-01T16:59:59.000+0000",
+        "2023-05-01T17:30:00.5+00:00"]]
+    assert filter_json.filter_batch(
+        {"datetimeIso": [">2023-05-01T12:00:00.000-0500",
+                         "<2023-05-01T14:00:00.000-0400"]},
+        records) == [record for record in records if match(record)]
+
+
+def test_filter_any():
+    assert filter_json.filter_any(
+        [{"num": [">11", "<33"], "data": {"val": ">90"}}, {"name": "foo"}],
+        json_input) == [json_input[0], json_input[1], json_input[2],
+                        json_input[4]]
+    assert filter_json.filter_any(
+        {"name": "foo"}, json_input, is_reverse=True) == [
+            json_input[1], json_input[3]]
+
+
+def test_filter_batch_matches_filter_any():
+    mixed_input = json_input + [
+        {"name": 12, "num": "20", "data": []},
+        {"name": None, "num": 2 ** 60, "data": {"key": "asd", "val": 1.5}},
+        {"num": 20.0, "data": [{"val": 44}, 3]},
+        "not an object",
+    ]
+    filters = [
+        {"num": 20},
+        {"num": [">-1", "<33"]},
+        {"name": "foo"},
+        {"name": "~bar"},
+        {"name": "undefined"},
+        {"num": [">11", "<33"], "data": {"val": ">90"}},
+        [{"num": [">11", "<33"], "data": {"val": ">90"}}, {"name": "foo"}],
+        {"data": {"key": "asd"}},
+        {"data": {"val": ">40"}},
+        {"num": "~1152921504606846976"},
+        {},
+    ]
+    for filter_obj in filters:
+        for is_reverse in [False, True]:
+            try:
+                expected = filter_json.filter_any(
+                    filter_obj, mixed_input, is_reverse)
+            except TypeError:
+                # Ordering a number against a string fails on both paths
+                with pytest.raises(TypeError):
+                    filter_json.filter_batch(
+                        filter_obj, mixed_input, is_reverse)
+                continue
+            assert filter_json.filter_batch(
+                filter_obj, mixed_input, is_reverse) == expected
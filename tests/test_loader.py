@@ -0,0 +1,180 @@
+import bz2
+import gzip
+import json
+import lzma
+import pytest
+from lib import cache
+from lib import file_index
+from lib import loader
+import zipfile
+
+
+def write_inputs(tmp_path):
+    (tmp_path / "a.json").write_text(json.dumps([{"num": 1}, {"num": 2}]))
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.txt").write_text(json.dumps({"num": 3}))
+    (tmp_path / "ignored.csv").write_text("num\n4\n")
+
+
+def collect(tmp_path, **kwargs):
+    batches = []
+    loader.load_json(
+        tmp_path,
+        lambda obj: batches.append((list(obj["files"]), list(obj["json"]))),
+        **kwargs)
+    return batches
+
+
+def test_load_json_reads_all_files(tmp_path):
+    write_inputs(tmp_path)
+    batches = collect(tmp_path)
+    assert len(batches) == 1
+    assert sorted(val["num"] for val in batches[0][1]) == [1, 2, 3]
+    assert len(batches[0][0]) == 2
+
+
+def test_load_json_workers_keep_file_order(tmp_path):
+    write_inputs(tmp_path)
+    assert collect(tmp_path, workers=2) == collect(tmp_path)
+
+
+def test_iter_json_matches_json_load(tmp_path, monkeypatch):
+    # Tiny reads force elements to be split across chunk boundaries
+    monkeypatch.setattr(loader, "READ_SIZE", 7)
+    docs = [
+        [{"a": [1, 2, {"b": "x, ]"}]}, 12345, -1.5e3, True, None, "s"],
+        [],
+        {"single": {"nested": [1, 2]}},
+        [123456789, 2147483647],
+    ]
+    for i, doc in enumerate(docs):
+        path = tmp_path / f"{i}.json"
+        path.write_text(json.dumps(doc, indent=2))
+        expected = doc if isinstance(doc, list) else [doc]
+        assert list(loader.iter_file(path)) == expected
+
+
+def test_iter_json_scalar_across_reads(tmp_path, monkeypatch):
+    # Numbers and literals cut by the end of the first read, which a
+    # shorter number decodes from (10. as 10)
+    for read_size in [8, loader.READ_SIZE]:
+        monkeypatch.setattr(loader, "READ_SIZE", read_size)
+        for scalar in ["0.1", "1e5", "-12.5", "true"]:
+            for cut in range(1, len(scalar)):
+                pad = read_size - cut - 1
+                text = ("[" + "1," * (pad // 2) + " " * (pad % 2) + scalar
+                        + ", 2]")
+                assert text[read_size - cut:read_size] == scalar[:cut]
+                path = tmp_path / "cut.json"
+                path.write_text(text)
+                assert list(loader.iter_file(path)) == json.loads(text), \
+                    (read_size, scalar, cut)
+
+
+def test_load_json_streams_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, "READ_SIZE", 64)
+    (tmp_path / "big.json").write_text(
+        json.dumps([{"num": i} for i in range(12000)]))
+    batches = collect(tmp_path)
+    assert [len(val[1]) for val in batches] == [5000, 5000, 2000]
+    assert [val[1][0]["num"] for val in batches] == [0, 5000, 10000]
+    assert all(len(val[0]) == 1 for val in batches)
+
+
+def test_iter_json_rejects_malformed(tmp_path):
+    for i, text in enumerate(['[{"a": 1} {"b": 2}]', '[1, 2', '[1] 2',
+                              '[1,]', '[{"a": 1}, ]', '[,]']):
+        path = tmp_path / f"{i}.json"
+        path.write_text(text)
+        with pytest.raises(json.JSONDecodeError):
+            list(loader.iter_file(path))
+
+
+def test_load_json_cache(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    write_inputs(data_dir)
+    file_cache = cache.FileCache(tmp_path / "cache")
+    expected = collect(data_dir)
+
+    assert collect(data_dir, cache=file_cache) == expected
+    assert file_cache.info()["entries"] == 2
+    assert collect(data_dir, cache=file_cache) == expected
+
+    # A changed file gets a new cache entry instead of the stale one
+    (data_dir / "a.json").write_text(json.dumps([{"num": 5}]))
+    assert ([val["num"] for val in collect(data_dir, cache=file_cache)[0][1]]
+            == [val["num"] for val in collect(data_dir)[0][1]])
+    assert file_cache.info()["entries"] == 3
+
+    file_cache.clear()
+    assert file_cache.info()["entries"] == 0
+
+
+def test_iter_file_batches(tmp_path):
+    entries = [{"num": i} for i in range(5)]
+    (tmp_path / "a.json").write_text(json.dumps(entries))
+    batches = list(loader.iter_file_batches(tmp_path / "a.json",
+                                            batch_size=2))
+    assert batches == [entries[0:2], entries[2:4], entries[4:5]]
+
+
+def test_load_json_compressed_and_zip(tmp_path):
+    data = {name: [{"num": i}] for i, name in enumerate(
+        ["a.json.gz", "b.json.bz2", "c.txt.xz", "d.json", "e.json.gz"])}
+    (tmp_path / "a.json.gz").write_bytes(
+        gzip.compress(json.dumps(data["a.json.gz"]).encode()))
+    (tmp_path / "b.json.bz2").write_bytes(
+        bz2.compress(json.dumps(data["b.json.bz2"]).encode()))
+    (tmp_path / "c.txt.xz").write_bytes(
+        lzma.compress(json.dumps(data["c.txt.xz"]).encode()))
+    with zipfile.ZipFile(tmp_path / "bundle.zip", "w") as bundle:
+        bundle.writestr("logs/d.json", json.dumps(data["d.json"]))
+        bundle.writestr("logs/e.json.gz",
+                        gzip.compress(json.dumps(data["e.json.gz"]).encode()))
+        bundle.writestr("notes.csv", "num\n9\n")
+
+    files = loader.list_files(tmp_path)
+    assert sorted(files) == sorted(
+        [str(tmp_path / name) for name in ["a.json.gz", "b.json.bz2",
+                                           "c.txt.xz"]]
+        + [str(tmp_path / "bundle.zip" / "logs" / name)
+           for name in ["d.json", "e.json.gz"]])
+    assert loader.list_files(tmp_path / "bundle.zip") == [
+        f for f in files if "bundle.zip" in f]
+    for file in files:
+        assert list(loader.iter_file(file)) == data[file.split("/")[-1]]
+
+    # Members are cached and indexed by the size and mtime of the bundle
+    file_cache = cache.FileCache(tmp_path / "cache")
+    expected = collect(tmp_path)
+    assert collect(tmp_path, cache=file_cache) == expected
+    assert collect(tmp_path, cache=file_cache) == expected
+    assert file_cache.info()["entries"] == 5
+    member = str(tmp_path / "bundle.zip" / "logs" / "d.json")
+    assert file_index.summarize_file(member)["count"] == 1
+
+
+def test_json_backends_match_stdlib(tmp_path, monkeypatch):
+    docs = [
+        [{"a": [1, 2.0, -0.0, 1e-7, 1.7976931348623157e308, "é µ \U0001f600"],
+          "b": None, "c": True, "d": {"": ""}}],
+        {"single": [123456789, -2147483648, 9223372036854775807, 0.1]},
+        [{"big": 18446744073709551616, "nan": float("nan")}],
+        [],
+    ]
+    for i, doc in enumerate(docs):
+        (tmp_path / f"{i}.json").write_text(json.dumps(doc))
+    (tmp_path / "4.json.gz").write_bytes(gzip.compress(b'[{"x": 1.5}]'))
+
+    for file in sorted(loader.list_files(tmp_path)):
+        expected = repr(list(loader.iter_file(file)))
+        for backend in loader.DECODERS:
+            assert repr(list(loader.iter_file(file, backend=backend))) \
+                == expected, (backend, file)
+
+    assert (loader.resolve_backend("auto")
+            == next(iter(loader.DECODERS), "stdlib"))
+    monkeypatch.setattr(loader, "DECODERS", dict())
+    assert loader.resolve_backend("auto") == "stdlib"
+    assert loader.resolve_backend("orjson") == "stdlib"
@@ -0,0 +1,42 @@
+import os
+from lib import manifest
+
+
+def test_manifest_plan(tmp_path):
+    files = [str(tmp_path / f"{i}.json") for i in range(3)]
+    for file in files[0:2]:
+        with open(file, "w") as input_file:
+            input_file.write("[]")
+    output_file = tmp_path / "out.csv"
+    path = manifest.default_path(output_file)
+    assert path.name == "out.csv.manifest.json"
+
+    # Nothing converted yet
+    first = manifest.Manifest(path)
+    assert first.plan(files[0:2], {"region": "NAR"}, output_file) is None
+    first.commit({"limits": {"lte_other": 1}})
+    first.save()
+    output_file.write_text("")
+
+    with open(files[2], "w") as input_file:
+        input_file.write("[]")
+    second = manifest.Manifest(path)
+    assert len(second) == 2
+    assert second.layout == {"limits": {"lte_other": 1}}
+    assert second.plan(files, {"region": "NAR"}, output_file) == files[2:]
+    second.commit()
+    assert len(second) == 3
+    assert second.layout == {"limits": {"lte_other": 1}}
+    assert second.plan(files, {"region": "NAR"}, output_file) == []
+
+    # Changed options, modified or removed files rebuild everything
+    assert second.plan(files, {"region": "EU"}, output_file) is None
+    second.commit()
+    assert second.plan(files, {"region": "EU"}, output_file) == []
+    os.utime(files[0], ns=(0, 0))
+    assert second.plan(files, {"region": "EU"}, output_file) is None
+    second.commit()
+    assert second.plan(files[1:], {"region": "EU"}, output_file) is None
+    second.commit()
+    output_file.unlink()
+    assert second.plan(files[1:], {"region": "EU"}, output_file) is None
@@ -0,0 +1,35 @@
+import json
+from lib import partition
+from lib import writer
+
+
+def test_get_value():
+    assert partition.get_value("date", "2023-05-01T07:00:01.000-0500") \
+        == "2023-05-01"
+    assert partition.get_value("operator", "AT&T") == "AT&T"
+
+
+def test_write_partitions(tmp_path):
+    partitions = [
+        ("AT&T", iter([("1", "a"), ("2", "b")])),
+        ("AT T", iter([("3", "c")])),
+        ("", iter([])),
+    ]
+    summaries = partition.write_partitions(
+        tmp_path / "out", "operator", ["t", "v"], partitions,
+        lambda row: row[0], compression="gzip", workers=2)
+    assert [(val["file"], val["rows"], val["time_min"], val["time_max"])
+            for val in summaries] == [
+        ("AT_T.csv.gz", 2, "1", "2"),
+        ("AT_T-2.csv.gz", 1, "3", "3"),
+        ("unknown.csv.gz", 0, None, None),
+    ]
+    with writer.read_output(tmp_path / "out" / "AT_T-2.csv.gz") \
+            as (header, rows):
+        assert header == ["t", "v"]
+        assert list(rows) == [["3", "c"]]
+
+    with open(tmp_path / "out" / partition.MANIFEST_FILE) as manifest_file:
+        manifest_obj = json.load(manifest_file)
+    assert manifest_obj["partition_by"] == "operator"
+    assert manifest_obj["partitions"] == summaries
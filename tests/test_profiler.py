@@ -0,0 +1,61 @@
+import json
+from lib import cell_helper
+from lib import cellular
+from lib import profiler
+from lib import sorter
+
+
+def test_profiler(tmp_path):
+    original = cell_helper.earfcn_to_band
+    assert profiler.stage("convert") is profiler.stage("write")
+    assert profiler.timed("convert", original) is original
+
+    profiler.start()
+    assert cell_helper.earfcn_to_band is not original
+    convert = profiler.timed(
+        "convert", lambda earfcns: [cell_helper.earfcn_to_band(val)
+                                    for val in earfcns])
+    assert convert([0, 600, 5010]) == [1, 2, 12]
+    with profiler.stage("write"):
+        assert list(profiler.timed_iter("sort", [3, 1, 2])) == [3, 1, 2]
+    report = profiler.stop(tmp_path / "profile.json")
+    assert cell_helper.earfcn_to_band is original
+
+    assert report["stages"]["convert"]["count"] == 1
+    assert report["stages"]["sort"]["count"] == 4
+    assert report["calls"]["cell_helper.earfcn_to_band"]["count"] == 3
+    convert_report = report["stages"]["convert"]
+    assert convert_report["self_seconds"] <= convert_report["seconds"]
+    with open(tmp_path / "profile.json") as report_file:
+        assert json.load(report_file) == report
+    with open(tmp_path / "profile.folded") as folded_file:
+        stacks = [line.rsplit(" ", 1)[0] for line in folded_file]
+    assert "convert;cell_helper.earfcn_to_band" in stacks
+
+
+def test_profiler_times_filter():
+    profiler.start()
+    # Filtered out before any row is built
+    assert list(cellular.convert_cellular(
+        [{"opName": "foo"}], {"filter": {"opName": "bar"}})) == []
+    report = profiler.stop()
+    assert report["calls"]["filter_json.filter_batch"]["count"] == 1
+
+
+def test_profiler_times_lazy_sort(tmp_path):
+    keys = list()
+    row_sorter = sorter.RowSorter(key=lambda row: keys.append(row) or row)
+    row_sorter.extend([(3,), (1,), (2,)])
+    profiler.start()
+    # Sorting starts with the first row taken, within the write stage
+    rows = profiler.timed_iter("sort", row_sorter.sorted())
+    assert keys == []
+    with profiler.stage("write"):
+        assert list(rows) == [(1,), (2,), (3,)]
+    report = profiler.stop(tmp_path / "profile.json")
+    assert len(keys) == 3
+    assert sorted(report["stages"]) == ["sort", "write"]
+    assert report["stages"]["sort"]["count"] == 4
+    with open(tmp_path / "profile.folded") as folded_file:
+        stacks = [line.rsplit(" ", 1)[0] for line in folded_file]
+    assert "write;sort" in stacks
@@ -0,0 +1,86 @@
+import pytest
+import random
+from lib import sorter
+
+
+def test_row_sorter_matches_sorted():
+    rnd = random.Random(4)
+    rows = [{"timestamp": str(rnd.randint(0, 50)), "idx": i, "pad": "x" * 50}
+            for i in range(3000)]
+    expected = sorted(rows, key=lambda x: x["timestamp"])
+
+    for budget in [None, 0.01, 0.000001]:
+        row_sorter = sorter.RowSorter(
+            key=lambda x: x["timestamp"], memory_budget=budget)
+        for row in rows:
+            row_sorter.append(row)
+        assert len(row_sorter) == len(rows)
+        assert list(row_sorter.sorted()) == expected
+        if budget is not None:
+            assert len(row_sorter.runs) > 1
+
+
+def test_merge_sorted():
+    def key(row):
+        return row["timestamp"]
+
+    streams = [
+        ("a", [{"timestamp": "1", "idx": 0}, {"timestamp": "3", "idx": 1}]),
+        ("b", [{"timestamp": "1", "idx": 2}, {"timestamp": "2", "idx": 3}]),
+    ]
+    rows = [row for _, stream in streams for row in stream]
+    assert list(sorter.merge_sorted(streams, key)) \
+        == sorted(rows, key=key)
+
+    streams = [("a", [{"timestamp": "2"}, {"timestamp": "1"}])]
+    with pytest.raises(ValueError, match="a is not sorted"):
+        list(sorter.merge_sorted(streams, key))
+
+
+def test_merge_sorted_groups(monkeypatch):
+    monkeypatch.setattr(sorter, "MERGE_GROUP", 2)
+    rnd = random.Random(6)
+    streams = [(str(i), sorted(
+        [{"timestamp": str(rnd.randint(0, 9)), "idx": (i, j)}
+         for j in range(rnd.randint(0, 20))],
+        key=lambda x: x["timestamp"])) for i in range(7)]
+    opened = [0, 0]
+
+    def read(rows):
+        opened[0] += 1
+        opened[1] = max(opened)
+        yield from rows
+        opened[0] -= 1
+
+    rows = list(sorter.merge_sorted(
+        [(name, read(rows)) for name, rows in streams],
+        key=lambda x: x["timestamp"]))
+    assert rows == sorted([row for _, rows in streams for row in rows],
+                          key=lambda x: x["timestamp"])
+    assert opened == [0, 2]
+
+    streams[5] = ("5", [{"timestamp": "2"}, {"timestamp": "1"}])
+    with pytest.raises(sorter.UnsortedError, match="5 is not sorted"):
+        list(sorter.merge_sorted(streams, key=lambda x: x["timestamp"]))
+
+
+def test_partition_sorter():
+    rnd = random.Random(5)
+    rows = [{"timestamp": str(rnd.randint(0, 50)), "part": i % 3,
+             "pad": "x" * 50} for i in range(3000)]
+
+    for budget in [None, 0.01]:
+        partition_sorter = sorter.PartitionSorter(
+            lambda x: x["part"], key=lambda x: x["timestamp"],
+            memory_budget=budget)
+        for row in rows:
+            partition_sorter.append(row)
+        assert len(partition_sorter) == len(rows)
+        partitions = partition_sorter.partitions()
+        assert [val for val, _ in partitions] == [0, 1, 2]
+        for val, row_sorter in partitions:
+            assert list(row_sorter.sorted()) == sorted(
+                [row for row in rows if row["part"] == val],
+                key=lambda x: x["timestamp"])
+            if budget is not None:
+                assert len(row_sorter.runs) > 0
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from lib import util
+
+
+def test_parse_timestamp():
+    for input_str, iso_str in [
+            ("2023-05-01T12:49:05.000-0500", "2023-05-01T12:49:05-05:00"),
+            ("2023-05-01T12:49:05.123+0530", "2023-05-01T12:49:05.123+05:30"),
+            ("1999-12-31T23:59:59.999+0000", "1999-12-31T23:59:59.999+00:00"),
+            ("2024-02-29T00:00:00.001-0930", "2024-02-29T00:00:00.001-09:30")]:
+        timestamp = datetime.fromisoformat(iso_str)
+        expected = (timestamp - util.EPOCH) // timedelta(microseconds=1)
+        assert util.parse_timestamp(input_str) == expected * 1000
+        assert util.parse_timestamp(timestamp.isoformat()) == expected * 1000
+        offset = util.parse_utc_offset(input_str)
+        assert offset == timestamp.utcoffset().total_seconds()
+        assert util.format_timestamp(expected * 1000, offset) \
+            == timestamp.isoformat()
+        shifted = timestamp - timedelta(milliseconds=1500)
+        assert util.format_timestamp(expected * 1000 - 1500000000, offset) \
+            == shifted.isoformat()
+
+    for input_str in ["2023-02-29T12:00:00.000+0000",
+                      "2023-05-01T24:00:00.000+0000", "yesterday"]:
+        with pytest.raises(ValueError):
+            util.parse_timestamp(input_str)
+        with pytest.raises(ValueError):
+            util.parse_timestamps([input_str])
+
+
+def test_parse_timestamps():
+    input_strs = [
+        "2023-05-01T12:49:05.000-0500",
+        "2023-05-01T17:49:05.000+0000",
+        "1970-01-01T00:00:00.000+0000",
+        "2000-02-29T23:59:59.999+1400",
+        "2023-05-01T12:49:04.900000-05:00",
+        "2023-05-01T12:49:05-05:00",
+        "2023-05-01T12:49:05.000-05:00",
+    ]
+    timestamps = util.parse_timestamps(input_strs)
+    assert timestamps.dtype == np.int64
+    assert timestamps.tolist() == [util.parse_timestamp(input_str)
+                                   for input_str in input_strs]
+    assert timestamps[0] == timestamps[1] == timestamps[5]
+    assert timestamps[2] == 0
+    assert len(util.parse_timestamps([])) == 0
+
+
+def test_timestamp_key():
+    # Sorted by time rather than by string when UTC offsets differ
+    rows = [("b", "2023-05-01T12:00:00.000-0500"),
+            ("a", "2023-05-01T13:30:00.000-0400"),
+            ("c", "2023-05-01T16:45:00.000+0000")]
+    assert [row[0] for row in sorted(rows, key=util.timestamp_key(1))] \
+        == ["c", "b", "a"]
@@ -0,0 +1,48 @@
+import numpy as np
+from lib import wifi_helper
+
+
+def get_channel_from_freq_linear(freq, width):
+    freq_code = wifi_helper._get_freq_code(freq)
+    cell_table = wifi_helper._get_cell_table(freq_code)
+    ch_list = next(
+        (x for x in cell_table if freq in range(x[2], x[3]) and x[4] == width),
+        None)
+    return ch_list[0] if ch_list else None
+
+
+def test_get_channel_from_freq():
+    freqs = list(range(2390, 7140)) + [2412.0, 2412.5, 5925.0, None, "NaN"]
+    widths = [10, 20, 22, 40, 80, 160, 320, 0, 30]
+    for freq in freqs:
+        assert wifi_helper.get_freq_code(freq) \
+            == wifi_helper._get_freq_code(freq)
+        for width in widths:
+            assert wifi_helper.get_channel_from_freq(freq, width) \
+                == get_channel_from_freq_linear(freq, width)
+
+
+    # NumPy scalars, e.g. from a columnar output, behave like Python numbers
+    assert wifi_helper.get_freq_code(np.int64(2412)) == "2.4"
+    assert wifi_helper.get_channel_from_freq(np.int64(2412), 20) == 1
+    assert wifi_helper.get_channel_from_freq(np.int32(5180),
+                                             np.int64(20)) == 36
+    assert wifi_helper.get_freq_code(np.float64(5955.0)) == "6"
+
+
+def test_get_channel_from_freq_array():
+    freqs = [2412, 2437, 5180, 5180, 5955, 6105, 2412.5, 2000, 7200]
+    widths = [20, 22, 80, 20, 320, 40, 20, 20, 20]
+    freq_codes, channels = wifi_helper.get_channel_from_freq_array(
+        freqs, widths)
+    assert freq_codes.tolist() == [wifi_helper.get_freq_code(freq)
+                                   for freq in freqs]
+    assert channels.tolist() == [
+        wifi_helper.get_channel_from_freq(freq, width)
+        for freq, width in zip(freqs, widths)]
+
+
+def test_get_channel_from_num():
+    assert wifi_helper.get_channel_from_num("5", 36) == 36
+    assert wifi_helper.get_channel_from_num("5", 37) is None
+    assert wifi_helper.get_channel_from_num("unknown", 36) is None
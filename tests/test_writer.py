@@ -0,0 +1,71 @@
+import bz2
+import gzip
+import io
+import lzma
+import pytest
+from lib import writer
+
+
+def test_row_writer():
+    output_file = io.StringIO()
+    row_writer = writer.RowWriter(output_file, ["a", "b"])
+    row_writer.extend([])
+    assert len(row_writer) == 0
+    assert output_file.getvalue() == ""
+    row_writer.append((1, "x"))
+    row_writer.extend([(2, "y, z")])
+    assert len(row_writer) == 2
+    assert output_file.getvalue().splitlines() == ["a,b", "1,x", '2,"y, z"']
+
+
+def test_open_output_compressed(tmp_path, monkeypatch):
+    # Small chunks so several of them go through the queue
+    monkeypatch.setattr(writer, "CHUNK_SIZE", 64)
+    rows = [(i, f"value {i}") for i in range(1000)]
+    expected = "a,b\r\n" + "".join(f"{i},value {i}\r\n" for i in range(1000))
+    for name, opener in [("out.csv.gz", gzip.open), ("out.csv.bz2", bz2.open),
+                         ("out.csv.xz", lzma.open), ("out.csv", open)]:
+        with writer.open_output(tmp_path / name) as output_file:
+            writer.RowWriter(output_file, ["a", "b"]).extend(rows)
+        with opener(tmp_path / name, "rt", newline="") as input_file:
+            assert input_file.read() == expected
+
+    # The flag takes precedence over the suffix
+    with writer.open_output(tmp_path / "out.csv", "gzip") as output_file:
+        output_file.write("x\n")
+    assert gzip.decompress((tmp_path / "out.csv").read_bytes()) == b"x\n"
+    with pytest.raises(ValueError):
+        writer.open_output(tmp_path / "out.csv", "zstd")
+
+
+def test_compressed_file_error(tmp_path):
+    compressed = writer.CompressedFile(tmp_path / "out.gz", "gzip")
+    compressed.compressor = None
+    compressed.write(b"x")
+    with pytest.raises(AttributeError):
+        compressed.close()
+
+
+def test_merge_output(tmp_path):
+    path = tmp_path / "out.csv.gz"
+    with writer.open_output(path) as output_file:
+        writer.RowWriter(output_file, ["t", "a"]).extend(
+            [("1", "x"), ("3", "y"), ("5", "z")])
+
+    # New rows are merged by key, and the old ones padded to new columns
+    num_rows = writer.merge_output(
+        path, ["t", "a", "b"], [("2", "u", 7), ("3", "v", 8)],
+        key=lambda row: row[0], fills=["", "", "NaN"])
+    assert num_rows == 5
+    with writer.read_output(path) as (header, rows):
+        assert header == ["t", "a", "b"]
+        assert list(rows) == [
+            ["1", "x", "NaN"], ["2", "u", "7"], ["3", "y", "NaN"],
+            ["3", "v", "8"], ["5", "z", "NaN"]]
+
+    with pytest.raises(ValueError):
+        writer.merge_output(path, ["t", "a"], [], key=lambda row: row[0])
+    with pytest.raises(ValueError):
+        writer.merge_output(path, ["t", "a", "b"], [("4",), ("1",)],
+                            key=lambda row: row[0])
+    assert [val.name for val in tmp_path.iterdir()] == ["out.csv.gz"]